@@ -1,5 +1,8 @@
 """Collection of string matching utilities for DNA sequences."""
 
+import gzip
+import io
+
 
 def naive(p, t):
     """Return the naive match of a substring to a string."""
@@ -15,13 +18,25 @@ def naive(p, t):
     return occurrences
 
 
+_COMPLEMENT = str.maketrans('ACGTN', 'TGCAN')
+
+
 def reverseComplement(s):
     """Return the reverse complement of a string."""
-    complement = {'A': 'T', 'C': 'G', 'G': 'C', 'T': 'A', 'N': 'N'}
-    t = ''
-    for base in s:
-        t = complement[base] + t
-    return t
+    return s.translate(_COMPLEMENT)[::-1]
+
+
+def reverseComplements(seqs):
+    """Return the reverse complements of a list of sequences.
+
+    The batch is joined into one string, so it is translated and
+    reversed in two C-level passes rather than two per sequence.
+    """
+    if not seqs:
+        return []
+    rcs = '\n'.join(seqs).translate(_COMPLEMENT)[::-1].split('\n')
+    rcs.reverse()  # reversing the joined string also reversed the order
+    return rcs
 
 
 def readGenome(filename):
@@ -35,32 +50,68 @@ def readGenome(filename):
     return genome
 
 
-def readFastq(filename):
-    """Return a tuple of sequences and qualities from a fastq file."""
-    sequences = []
-    qualities = []
-    with open(filename) as fh:
+def openFastq(filename, buffer_size=1 << 20):
+    """Return a buffered binary handle, decompressing gzip input."""
+    with open(filename, 'rb') as fh:
+        gzipped = fh.read(2) == b'\x1f\x8b'  # gzip magic number
+    if gzipped:
+        return io.BufferedReader(gzip.open(filename, 'rb'), buffer_size)
+    return open(filename, 'rb', buffering=buffer_size)
+
+
+def iterFastq(filename, batch_size=None, buffer_size=1 << 20):
+    """Yield (name, sequence, quality) records from a fastq file.
+
+    Records are read lazily, so memory stays flat however large the
+    file is.  If batch_size is given, lists of up to batch_size records
+    are yielded instead of single records.
+    """
+    batch = []
+    with openFastq(filename, buffer_size) as fh:
         while True:
-            fh.readline()  # skip name line
+            name = fh.readline().rstrip()  # name line, starts with '@'
             seq = fh.readline().rstrip()  # read base sequence
             fh.readline()  # skip placeholder line
             qual = fh.readline().rstrip()  # base quality line
             if len(seq) == 0:
                 break
-            sequences.append(seq)
-            qualities.append(qual)
+            record = (name[1:].decode(), seq.decode(), qual.decode())
+            if batch_size is None:
+                yield record
+                continue
+            batch.append(record)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def readFastq(filename):
+    """Return a tuple of sequences and qualities from a fastq file."""
+    sequences = []
+    qualities = []
+    for _, seq, qual in iterFastq(filename):
+        sequences.append(seq)
+        qualities.append(qual)
     return sequences, qualities
 
 
 # implement a version of naive matching that is strand aware
 def sa_naive(p, t):
     """Return a naive string match that considers the reverse complement."""
-    occurrences = []
-    if reverseComplement(p) == p:  # if the reverse complement is the same,
+    rc = reverseComplement(p)
+    if rc == p:  # if the reverse complement is the same,
         return naive(p, t)  # just return the naive match
-    occurrences = naive(p, t)  # otherwise, set result to be the naive match
-    occurrences += naive(reverseComplement(p), t)  # then add in the complement
-    return occurrences
+    # otherwise check both strands in a single pass over t; forward
+    # matches are listed first, then the complement's, as before
+    occurrences, rc_occurrences = [], []
+    for i in range(len(t) - len(p) + 1):
+        if t.startswith(p, i):
+            occurrences.append(i)
+        elif t.startswith(rc, i):
+            rc_occurrences.append(i)
+    return occurrences + rc_occurrences
 
 
 def naive_2mm(p, t):
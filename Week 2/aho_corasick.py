@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+
+"""aho_corasick.py: Multi-pattern matching with an Aho-Corasick automaton.
+
+One automaton is built from a whole batch of patterns (reads) and the
+text is scanned once per batch, instead of once per pattern.  Very large
+read sets are split into waves whose automata fit a memory budget.
+"""
+
+from better_matching import reverseComplement
+
+# approximate automaton size per pattern character: reads share few
+# prefixes, so nearly every character is a state with its own goto
+# dict, output list and failure links (measured ~290 bytes on 100 bp
+# random reads)
+STATE_BYTES = 300
+
+
+class AhoCorasick(object):
+    """ Automaton matching a set of patterns in a single pass over T """
+
+    def __init__(self, patterns):
+        """ Build the automaton; pattern ids are positions in patterns """
+        self.lengths = [len(p) for p in patterns]
+        self.goto = [{}]  # state -> {character: next state}
+        self.out = [[]]  # state -> ids of patterns ending at that state
+        for pid, p in enumerate(patterns):
+            state = 0
+            for c in p:
+                nxt = self.goto[state].get(c)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][c] = nxt
+                    self.goto.append({})
+                    self.out.append([])
+                state = nxt
+            self.out[state].append(pid)
+        # Breadth-first pass to set failure links; a state's output link
+        # points to the nearest state on its failure chain with outputs
+        self.fail = [0] * len(self.goto)
+        self.out_link = [0] * len(self.goto)
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for c, nxt in self.goto[state].items():
+                f = self.fail[state]
+                while f and c not in self.goto[f]:
+                    f = self.fail[f]
+                f = self.goto[f].get(c, 0)
+                self.fail[nxt] = f
+                self.out_link[nxt] = f if self.out[f] else self.out_link[f]
+                queue.append(nxt)
+
+    def __len__(self):
+        return len(self.goto)
+
+    def search(self, t):
+        """ Yield (pattern id, offset) for every occurrence in t """
+        goto, fail, out, out_link = self.goto, self.fail, self.out, \
+            self.out_link
+        lengths = self.lengths
+        state = 0
+        for i, c in enumerate(t):
+            while state and c not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(c, 0)
+            s = state
+            while s:
+                for pid in out[s]:
+                    yield pid, i - lengths[pid] + 1
+                s = out_link[s]
+
+
+def batch_match(reads, t, max_bytes=256 << 20):
+    """Yield (read id, offset, strand) for exact hits of reads in t.
+
+    Each read is searched together with its reverse complement (strand
+    '-'), unless the two are the same.  Reads are taken in waves, each
+    building one automaton and scanning t once.  An automaton costs
+    about STATE_BYTES per pattern character, so a wave holds at most
+    max_bytes // STATE_BYTES characters of reads and reverse complements
+    (about 900 kbp, or 4500 100 bp reads, for the default 256 MB).
+    """
+    wave, hits_of, size = [], [], 0
+    for rid, read in enumerate(reads):
+        rc = reverseComplement(read)
+        strands = [(read, '+')] if rc == read else [(read, '+'), (rc, '-')]
+        for pattern, strand in strands:
+            cost = len(pattern) * STATE_BYTES
+            if wave and size + cost > max_bytes:
+                for pid, offset in AhoCorasick(wave).search(t):
+                    yield hits_of[pid][0], offset, hits_of[pid][1]
+                wave, hits_of, size = [], [], 0
+            wave.append(pattern)
+            hits_of.append((rid, strand))
+            size += cost
+    if wave:
+        for pid, offset in AhoCorasick(wave).search(t):
+            yield hits_of[pid][0], offset, hits_of[pid][1]
@@ -1,6 +1,10 @@
 """Collection of string matching utilities for DNA sequences."""
 
-from bm_preproc import BoyerMoore
+import gzip
+import io
+
+from bm_cache import default_cache
+from fasta_index import FastaIndex
 from pigeonhole import Index, SubseqIndex
 
 
@@ -92,13 +96,25 @@ def bm_with_counts(p, p_bm, t):
     return occurrences, alignments, comparisons
 
 
+_COMPLEMENT = str.maketrans('ACGTN', 'TGCAN')
+
+
 def reverseComplement(s):
     """Return the reverse complement of a string."""
-    complement = {'A': 'T', 'C': 'G', 'G': 'C', 'T': 'A', 'N': 'N'}
-    t = ''
-    for base in s:
-        t = complement[base] + t
-    return t
+    return s.translate(_COMPLEMENT)[::-1]
+
+
+def reverseComplements(seqs):
+    """Return the reverse complements of a list of sequences.
+
+    The batch is joined into one string, so it is translated and
+    reversed in two C-level passes rather than two per sequence.
+    """
+    if not seqs:
+        return []
+    rcs = '\n'.join(seqs).translate(_COMPLEMENT)[::-1].split('\n')
+    rcs.reverse()  # reversing the joined string also reversed the order
+    return rcs
 
 
 def readGenome(filename):
@@ -112,32 +128,68 @@ def readGenome(filename):
     return genome
 
 
-def readFastq(filename):
-    """Return a tuple of sequences and qualities from a fastq file."""
-    sequences = []
-    qualities = []
-    with open(filename) as fh:
+def openFastq(filename, buffer_size=1 << 20):
+    """Return a buffered binary handle, decompressing gzip input."""
+    with open(filename, 'rb') as fh:
+        gzipped = fh.read(2) == b'\x1f\x8b'  # gzip magic number
+    if gzipped:
+        return io.BufferedReader(gzip.open(filename, 'rb'), buffer_size)
+    return open(filename, 'rb', buffering=buffer_size)
+
+
+def iterFastq(filename, batch_size=None, buffer_size=1 << 20):
+    """Yield (name, sequence, quality) records from a fastq file.
+
+    Records are read lazily, so memory stays flat however large the
+    file is.  If batch_size is given, lists of up to batch_size records
+    are yielded instead of single records.
+    """
+    batch = []
+    with openFastq(filename, buffer_size) as fh:
         while True:
-            fh.readline()  # skip name line
+            name = fh.readline().rstrip()  # name line, starts with '@'
             seq = fh.readline().rstrip()  # read base sequence
             fh.readline()  # skip placeholder line
             qual = fh.readline().rstrip()  # base quality line
             if len(seq) == 0:
                 break
-            sequences.append(seq)
-            qualities.append(qual)
+            record = (name[1:].decode(), seq.decode(), qual.decode())
+            if batch_size is None:
+                yield record
+                continue
+            batch.append(record)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def readFastq(filename):
+    """Return a tuple of sequences and qualities from a fastq file."""
+    sequences = []
+    qualities = []
+    for _, seq, qual in iterFastq(filename):
+        sequences.append(seq)
+        qualities.append(qual)
     return sequences, qualities
 
 
 # implement a version of naive matching that is strand aware
 def sa_naive(p, t):
     """Return a naive string match that considers the reverse complement."""
-    occurrences = []
-    if reverseComplement(p) == p:  # if the reverse complement is the same,
+    rc = reverseComplement(p)
+    if rc == p:  # if the reverse complement is the same,
         return naive(p, t)  # just return the naive match
-    occurrences = naive(p, t)  # otherwise, set result to be the naive match
-    occurrences += naive(reverseComplement(p), t)  # then add in the complement
-    return occurrences
+    # otherwise check both strands in a single pass over t; forward
+    # matches are listed first, then the complement's, as before
+    occurrences, rc_occurrences = [], []
+    for i in range(len(t) - len(p) + 1):
+        if t.startswith(p, i):
+            occurrences.append(i)
+        elif t.startswith(rc, i):
+            rc_occurrences.append(i)
+    return occurrences + rc_occurrences
 
 
 def naive_2mm(p, t):
@@ -164,7 +216,7 @@ def approximate_match(p, t, n):
     for i in range(n+1):
         start = i*segment_length
         end = min((i+1)*segment_length, len(p))
-        p_bm = BoyerMoore(p[start:end], alphabet='ACGT')
+        p_bm = default_cache.get(p[start:end], alphabet='ACGT')
         matches = boyer_moore(p[start:end], p_bm, t)
         hits = 0
         for m in matches:
@@ -236,7 +288,7 @@ def index_match(p, t, n):
     for i in range(n+1):
         start = i*segment_length
         end = min((i+1)*segment_length, len(p))
-        p_bm = BoyerMoore(p[start:end], alphabet='ACGT')
+        p_bm = default_cache.get(p[start:end], alphabet='ACGT')
         matches = boyer_moore(p[start:end], p_bm, t)
 
         for m in matches:
@@ -259,3 +311,154 @@ def index_match(p, t, n):
                 all_matches.add(m-start)
 
     return list(all_matches), matches
+
+
+def _seeds(p, index, n):
+    """Return (offset in p, seed) pairs to look up for n mismatches.
+
+    With a spaced subsequence index (ival > 1) the seeds are the first
+    subsequence at each of the first ival offsets of p, which are
+    disjoint, so ival must be at least n+1.  Otherwise p is split into
+    n+1 partitions and each partition's first k-mer is a seed.
+    """
+    ival = getattr(index, 'ival', 1)
+    if ival > 1:
+        if ival < n+1:
+            raise ValueError('ival=%d is too small for %d mismatches'
+                             % (ival, n))
+        if len(p) < index.span + ival - 1:
+            raise ValueError('read too short for subsequence index')
+        return [(i, p[i:]) for i in range(ival)]
+    segment_length = len(p) // (n+1)
+    if segment_length < index.k:
+        raise ValueError('partitions of %d bases are shorter than k=%d'
+                         % (segment_length, index.k))
+    return [(i*segment_length, p[i*segment_length:]) for i in range(n+1)]
+
+
+def map_read(p, t, index, n):
+    """Map read p to t with up to n mismatches using a k-mer index.
+
+    Every seed of p and of its reverse complement is looked up in the
+    index (an Index, SubseqIndex or any object with the same query), the
+    candidate loci are deduplicated and each is verified once against t.
+    Return (best, hits, index_hits, verifications): hits is a list of
+    (offset, strand, mismatches) sorted by offset, best is the hit with
+    fewest mismatches (None if there are no hits), index_hits is the
+    number of offsets returned by the index and verifications the number
+    of distinct loci checked against t.
+    """
+    strands = [('+', p)]
+    rc = reverseComplement(p)
+    if rc != p:
+        strands.append(('-', rc))
+    loci = dict((strand, set()) for strand, _ in strands)
+    index_hits = 0
+    if getattr(index, 'canonical', False):
+        # one lookup per seed finds both strands: a '-' hit is the
+        # seed's reverse complement, which starts len(p)-start-k into rc
+        for start, seed in _seeds(p, index, n):
+            for offset, strand in index.query(seed):
+                index_hits += 1
+                if strand == '+':
+                    locus = offset - start
+                else:
+                    locus = offset - (len(p) - start - index.k)
+                if strand in loci and 0 <= locus <= len(t) - len(p):
+                    loci[strand].add(locus)
+    else:
+        for strand, read in strands:
+            for start, seed in _seeds(read, index, n):
+                for offset in index.query(seed):
+                    index_hits += 1
+                    locus = offset - start
+                    if 0 <= locus <= len(t) - len(read):
+                        loci[strand].add(locus)
+    hits = []
+    verifications = 0
+    for strand, read in strands:
+        for locus in loci[strand]:
+            verifications += 1
+            window = t[locus:locus+len(read)]
+            mismatches = 0
+            for j in range(len(read)):
+                if read[j] != window[j]:
+                    mismatches += 1
+                    if mismatches > n:
+                        break
+            if mismatches <= n:
+                hits.append((locus, strand, mismatches))
+    hits.sort()
+    best = min(hits, key=lambda hit: (hit[2], hit[0])) if hits else None
+    return best, hits, index_hits, verifications
+
+
+def map_reads(reads, t, index, n):
+    """Yield map_read results for each read of an iterable, lazily."""
+    for read in reads:
+        yield map_read(read, t, index, n)
+
+
+def readContigs(filename):
+    """Return a list of (name, sequence) records from a fasta file."""
+    with FastaIndex(filename) as fasta:
+        return list(fasta.items())
+
+
+def contig_match(p, contigs, matcher=naive):
+    """Return (contig, offset) matches of p in each contig separately.
+
+    contigs is a FastaIndex or a list of (name, sequence) records, and
+    matcher is any function of (p, t) returning a list of offsets, so
+    no hit can span the boundary between two contigs.  Use bm_matcher
+    and mismatch_matcher to adapt boyer_moore, approximate_match and
+    index_match, and contig_map_read for map_read.
+    """
+    if isinstance(contigs, FastaIndex):
+        contigs = contigs.items()
+    occurrences = []
+    for name, seq in contigs:
+        occurrences += [(name, i) for i in matcher(p, seq)]
+    return occurrences
+
+
+def bm_matcher(alphabet='ACGT'):
+    """Return a (p, t) matcher running boyer_moore with cached tables."""
+    def match(p, t):
+        return boyer_moore(p, default_cache.get(p, alphabet=alphabet), t)
+    return match
+
+
+def mismatch_matcher(matcher, n):
+    """Return a (p, t) matcher for a matcher(p, t, n) returning a tuple
+    (offsets, ...), such as approximate_match or index_match."""
+    def match(p, t):
+        return sorted(matcher(p, t, n)[0])
+    return match
+
+
+def index_contigs(contigs, k, ival=None):
+    """Return (name, sequence, index) for each contig, the index being
+    an Index (or SubseqIndex if ival is given) of that contig alone."""
+    if isinstance(contigs, FastaIndex):
+        contigs = contigs.items()
+    indexed = []
+    for name, seq in contigs:
+        if ival is None:
+            index = Index(seq, k)
+        else:
+            index = SubseqIndex(seq, k, ival)
+        indexed.append((name, seq, index))
+    return indexed
+
+
+def contig_map_read(p, indexed, n):
+    """Map read p to each contig of index_contigs with map_read.
+
+    Return a list of (contig, offset, strand, mismatches) hits.
+    """
+    hits = []
+    for name, seq, index in indexed:
+        _, contig_hits, _, _ = map_read(p, seq, index, n)
+        hits += [(name,) + hit for hit in contig_hits]
+    return hits
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+
+"""bitap.py: Bit-parallel (Shift-Add / Wu-Manber) approximate matching.
+
+The state of every alignment at the current text position is packed
+into the bits of an integer and updated with a handful of word
+operations per text character.  Python ints grow as needed, so patterns
+longer than a machine word work too, and the text is scanned once in a
+single pass.  Mismatches are counted with Shift-Add; edits use the
+Wu-Manber extension of Shift-And with one state per error level 0..k.
+"""
+
+import time
+
+
+def pattern_masks(p):
+    """Return dict mapping each character to the bit mask of its
+    positions in p (bit i set if p[i] is that character).
+    """
+    masks = {}
+    for i, c in enumerate(p):
+        masks[c] = masks.get(c, 0) | (1 << i)
+    return masks
+
+
+def bitap_mismatch(p, t, k):
+    """Return offsets where p matches t with at most k mismatches.
+
+    Uses Shift-Add: the state holds one counter field per pattern
+    position, wide enough to count up to len(p) mismatches, so one shift
+    and one add per text character update every alignment at once.
+    Same result as naive_2mm (for k=2) in better_matching.py.
+    """
+    m = len(p)
+    if m == 0:  # the empty pattern matches at every offset
+        return list(range(len(t) + 1))
+    width = m.bit_length()  # bits per counter, never overflows
+    mask = (1 << (width * m)) - 1
+    top = width * (m - 1)  # counter of the alignment ending here
+    every = sum(1 << (width * i) for i in range(m))
+    costs = {}  # character -> 1 in the field of each mismatching position
+    for c in set(p):
+        costs[c] = every - sum(1 << (width * i)
+                               for i in range(m) if p[i] == c)
+    state = 0
+    occurrences = []
+    for i, c in enumerate(t):
+        state = ((state << width) + costs.get(c, every)) & mask
+        if state >> top <= k and i >= m - 1:
+            occurrences.append(i - m + 1)
+    return occurrences
+
+
+def bitap_edit(p, t, k):
+    """Return end offsets e such that p matches some t[s:e] within k edits.
+
+    Offsets are exclusive, so 0 means p matched the empty prefix of t,
+    which only happens when k >= len(p).
+    """
+    m = len(p)
+    if m == 0:  # the empty pattern matches at every offset
+        return list(range(len(t) + 1))
+    masks = pattern_masks(p)
+    found = 1 << (m - 1)
+    # before any text is read, d errors allow the first d characters of
+    # p to be deleted
+    states = [(1 << d) - 1 for d in range(k + 1)]
+    occurrences = [0] if states[k] & found else []
+    for i, c in enumerate(t):
+        b = masks.get(c, 0)
+        prev = states[0]
+        states[0] = cur = ((prev << 1) | 1) & b
+        for d in range(1, k + 1):
+            old = states[d]
+            # match, substitution, insertion into p, deletion from p
+            cur = ((((old << 1) | 1) & b) | ((prev << 1) | 1) | prev |
+                   ((cur << 1) | 1))
+            states[d] = cur
+            prev = old
+        if cur & found:
+            occurrences.append(i + 1)
+    return occurrences
+
+
+def bitap_match_distance(p, t, max_dist=None):
+    """Return the smallest edit distance between p and any substring of t.
+
+    Same result as matchDistance in Week 3.  With max_dist given, only
+    distances up to max_dist are tracked and max_dist + 1 is returned if
+    p does not occur within that many edits.
+    """
+    m = len(p)
+    if m == 0:
+        return 0
+    k = m if max_dist is None else min(max_dist, m)
+    masks = pattern_masks(p)
+    found = 1 << (m - 1)
+    states = [(1 << d) - 1 for d in range(k + 1)]
+    best = k + 1
+    for d in range(k + 1):
+        if states[d] & found:
+            best = d
+            break
+    for c in t:
+        if best == 0:
+            break
+        b = masks.get(c, 0)
+        prev = states[0]
+        states[0] = cur = ((prev << 1) | 1) & b
+        if cur & found:
+            best = 0
+        # levels at or above the best distance so far cannot improve it
+        for d in range(1, best):
+            old = states[d]
+            cur = ((((old << 1) | 1) & b) | ((prev << 1) | 1) | prev |
+                   ((cur << 1) | 1))
+            states[d] = cur
+            prev = old
+            if cur & found:
+                best = d
+                break
+    return best
+
+
+if __name__ == '__main__':
+    from better_matching import readGenome, naive_2mm, approximate_match
+
+    genome = readGenome('chr1.GRCh38.excerpt.fasta')
+    for p in ['GGCGCGGTGGCTCACGCCTGTAAT',
+              'GGCGCGGTGGCTCACGCCTGTAATCCCAGCACTTTGGGAGGC']:
+        start = time.time()
+        expected = naive_2mm(p, genome)
+        naive_time = time.time() - start
+        start = time.time()
+        pigeonhole, _ = approximate_match(p, genome, 2)
+        pigeonhole_time = time.time() - start
+        start = time.time()
+        occurrences = bitap_mismatch(p, genome, 2)
+        bitap_time = time.time() - start
+        assert occurrences == expected
+        assert sorted(pigeonhole) == expected
+        print("|P| = %d, %d occurrences" % (len(p), len(occurrences)))
+        print("  naive_2mm:         %.2fs" % naive_time)
+        print("  approximate_match: %.2fs" % pigeonhole_time)
+        print("  bitap_mismatch:    %.2fs" % bitap_time)
+    for p in ['GCTGATCGATCGTACG', 'GATTTACCAGATTGAG']:
+        start = time.time()
+        distance = bitap_match_distance(p, genome)
+        print("match distance of %s: %d (%.2fs)"
+              % (p, distance, time.time() - start))
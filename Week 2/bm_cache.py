@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+"""bm_cache.py: A bounded LRU cache of Boyer-Moore preprocessing.
+
+Read sets repeat the same pigeonhole segments heavily, so the z-array,
+good suffix and bad character tables of a segment are built once and
+shared by every later lookup until the segment is evicted.
+"""
+
+import threading
+from collections import OrderedDict
+
+from bm_preproc import BoyerMoore
+
+
+def segments(p, n):
+    """Return the (start, end) pigeonhole segments used for n mismatches."""
+    segment_length = int(len(p) / (n+1))
+    return [(i*segment_length, min((i+1)*segment_length, len(p)))
+            for i in range(n+1)]
+
+
+class BoyerMooreCache(object):
+    """ Thread-safe LRU cache of BoyerMoore objects keyed on
+        (pattern, alphabet) """
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._cache)
+
+    def get(self, p, alphabet='ACGT'):
+        """ Return the BoyerMoore object for p, building it on a miss """
+        key = (p, alphabet)
+        with self._lock:
+            p_bm = self._cache.get(key)
+            if p_bm is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return p_bm
+            self.misses += 1
+        # build outside the lock so other threads are not held up
+        p_bm = BoyerMoore(p, alphabet=alphabet)
+        with self._lock:
+            if key in self._cache:  # another thread built it meanwhile
+                return self._cache[key]
+            self._cache[key] = p_bm
+            if len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+        return p_bm
+
+    def precompile(self, patterns, n=0, alphabet='ACGT'):
+        """ Build entries for every pigeonhole segment of each pattern
+            for n mismatches (the whole pattern when n is 0) """
+        for p in patterns:
+            for start, end in segments(p, n):
+                self.get(p[start:end], alphabet)
+
+    def stats(self):
+        """ Return dict of hit, miss and eviction counts and size """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'evictions': self.evictions, 'size': len(self._cache)}
+
+    def clear(self):
+        """ Drop all entries and reset the counters """
+        with self._lock:
+            self._cache.clear()
+            self.hits = self.misses = self.evictions = 0
+
+
+# Shared by approximate_match and index_match in better_matching.py
+default_cache = BoyerMooreCache()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+
+"""bm_compiled.py: Boyer-Moore over flat shift tables and encoded text.
+
+The bad character and good suffix rules of bm_preproc.BoyerMoore are
+evaluated once per (offset, character) when the pattern is compiled and
+stored in flat arrays, so the search loop does one array lookup per
+mismatch instead of method calls, assertions and dictionary lookups.
+Text and pattern are integer encoded; characters outside the alphabet
+get their own code, which never matches the pattern.
+"""
+
+from array import array
+
+from bm_preproc import BoyerMoore
+
+
+def text_table(alphabet='ACGT'):
+    """Return a bytes.translate table mapping each alphabet character to
+    its index and every other byte to len(alphabet)."""
+    table = bytearray([len(alphabet)] * 256)
+    for i, c in enumerate(alphabet):
+        table[ord(c)] = i
+    return bytes(table)
+
+
+def encode_text(t, alphabet='ACGT'):
+    """Return t encoded as bytes of alphabet codes.
+
+    Encode a text once and pass it to every search against it.
+    """
+    if isinstance(t, str):
+        t = t.encode('ascii')
+    return t.translate(text_table(alphabet))
+
+
+class CompiledBoyerMoore(object):
+    """ Boyer-Moore preprocessing of p compiled into flat arrays """
+
+    def __init__(self, p, alphabet='ACGT'):
+        self.p = p
+        self.alphabet = alphabet
+        self.sigma = sigma = len(alphabet) + 1  # last code: not in alphabet
+        self.codes = list(encode_text(p, alphabet))
+        m = len(p)
+        p_bm = BoyerMoore(p, alphabet=alphabet)
+        # bad[j*sigma + c]: shift for mismatch against code c at offset j
+        self.bad = array('i', [0] * (m * sigma))
+        for j in range(m):
+            for c in range(sigma - 1):
+                self.bad[j*sigma + c] = j - (p_bm.bad_char[j][c] - 1)
+            self.bad[j*sigma + sigma - 1] = j + 1  # skip past unknown char
+        self.good = array('i', [p_bm.good_suffix_rule(j) for j in range(m)])
+        self.match_skip = p_bm.match_skip()
+        # Horspool: shift by the text character under the last position
+        self.horspool = array('i', [m] * sigma)
+        for j in range(m - 1):
+            self.horspool[self.codes[j]] = m - 1 - j
+
+    def search(self, text, variant='bm'):
+        """ Return (occurrences, alignments, comparisons) in an encoded
+            text.  variant is 'bm' (same as bm_with_counts), 'galil'
+            (no re-comparison of the border known to match after an
+            occurrence) or 'horspool' (bad character rule on the last
+            window character only). """
+        if variant == 'horspool':
+            return self._search_horspool(text)
+        if variant not in ('bm', 'galil'):
+            raise ValueError('unknown Boyer-Moore variant %r' % variant)
+        galil = variant == 'galil'
+        pc, bad, good, sigma = self.codes, self.bad, self.good, self.sigma
+        m = len(pc)
+        match_skip = max(1, self.match_skip)
+        border = m - match_skip  # prefix known to match after a full match
+        occurrences = []
+        alignments = comparisons = 0
+        lower = 0  # offsets below this are known to match
+        i = 0
+        last = len(text) - m
+        while i <= last:
+            alignments += 1
+            j = m - 1
+            while j >= lower and pc[j] == text[i+j]:
+                j -= 1
+            if j < lower:
+                comparisons += m - lower
+                occurrences.append(i)
+                i += match_skip
+                if galil:
+                    lower = border
+            else:
+                comparisons += m - j
+                c = text[i+j]
+                shift = bad[j*sigma + c]
+                if good[j] > shift:
+                    shift = good[j]
+                i += shift if shift > 1 else 1
+                lower = 0
+        return occurrences, alignments, comparisons
+
+    def _search_horspool(self, text):
+        pc, hs = self.codes, self.horspool
+        m = len(pc)
+        occurrences = []
+        alignments = comparisons = 0
+        i = 0
+        last = len(text) - m
+        while i <= last:
+            alignments += 1
+            j = m - 1
+            while j >= 0 and pc[j] == text[i+j]:
+                j -= 1
+            comparisons += m - j if j >= 0 else m
+            if j < 0:
+                occurrences.append(i)
+            i += hs[text[i+m-1]]
+        return occurrences, alignments, comparisons
+
+
+def boyer_moore_compiled(p, t, variant='bm', alphabet='ACGT'):
+    """Return offsets of p in t; t may be a string or an encoded text."""
+    if isinstance(t, str):
+        t = encode_text(t, alphabet)
+    return CompiledBoyerMoore(p, alphabet).search(t, variant)[0]
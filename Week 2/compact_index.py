@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+
+"""compact_index.py: An integer-encoded k-mer index with array postings.
+
+Each k-mer (or spaced subsequence, as in SubseqIndex) is 2-bit encoded
+into an integer.  Offsets are counting-sorted by k-mer into one
+contiguous array (CSR layout) with a directory of where each k-mer's
+offsets start, so a query is a single array slice.  The offsets cost 4
+bytes per position.  The directory is direct (4 bytes per possible
+k-mer) while there are no more possible k-mers than positions, so at
+most 4 more bytes per position; for larger k it keeps only the k-mers
+that occur, sorted, at 12 bytes per distinct k-mer.  That is 8 to 16
+bytes per position instead of one Python tuple and string per position.
+"""
+
+import bisect
+from array import array
+
+# A, C, G, T -> 0..3; anything else -> 4 (k-mers containing it are skipped)
+_TABLE = bytearray([4] * 256)
+for _i, _c in enumerate(b'ACGT'):
+    _TABLE[_c] = _i
+_TABLE = bytes(_TABLE)
+
+# direct directories are never larger than this, however long the text
+MAX_DIRECT = 1 << 24
+
+
+def kmer_codes(t, k, ival=1):
+    """Return array of the 2-bit code of t[i:i+span:ival] at each offset
+    i, or -1 where the subsequence contains a non-ACGT character."""
+    if isinstance(t, str):
+        t = t.encode('ascii')
+    t = t.translate(_TABLE)
+    span = 1 + ival * (k - 1)
+    n = len(t) - span + 1
+    codes = array('q', [-1]) * max(n, 0)
+    mask = (1 << (2 * k)) - 1
+    # a subsequence at i shares k-1 characters with the one at i+ival, so
+    # roll the code along each residue class modulo ival
+    for r in range(ival):
+        code = 0
+        valid = 0  # number of trailing ACGT characters in the window
+        for i in range(r, len(t), ival):
+            c = t[i]
+            if c == 4:
+                valid = 0
+                continue
+            code = ((code << 2) | c) & mask
+            valid += 1
+            start = i - ival * (k - 1)
+            if valid >= k and start < n:
+                codes[start] = code
+    return codes
+
+
+def encode_kmer(kmer):
+    """Return the 2-bit code of a k-mer, or -1 if it is not all ACGT."""
+    code = 0
+    for c in kmer.encode('ascii').translate(_TABLE):
+        if c == 4:
+            return -1
+        code = (code << 2) | c
+    return code
+
+
+class CompactIndex(object):
+    """ Holds a 2-bit encoded k-mer (or subsequence) index for a text T """
+
+    def __init__(self, t, k, ival=1):
+        """ Create index from all subsequences of t of k characters
+            spaced ival apart (ival=1: plain k-mers, like Index) """
+        self.k = k
+        self.ival = ival
+        self.span = 1 + ival * (k - 1)
+        codes = kmer_codes(t, k, ival)
+        if 4 ** k <= min(len(codes), MAX_DIRECT):
+            self.keys = None
+            # counting sort: directory[c] is where code c's offsets start
+            counts = array('I', [0]) * (4 ** k + 1)
+            for c in codes:
+                if c >= 0:
+                    counts[c + 1] += 1
+            for c in range(1, len(counts)):
+                counts[c] += counts[c - 1]
+            self.offsets = array('I', [0]) * counts[-1]
+            # use counts[c] as code c's fill cursor; afterwards it holds
+            # where code c+1 starts, so shift it back by one entry
+            for i, c in enumerate(codes):
+                if c >= 0:
+                    self.offsets[counts[c]] = i
+                    counts[c] += 1
+            for c in range(len(counts) - 2, 0, -1):
+                counts[c] = counts[c - 1]
+            counts[0] = 0
+            self.directory = counts
+        else:
+            # more possible codes than positions: keep the distinct
+            # codes in sorted order and binary search them
+            order = sorted((i for i in range(len(codes)) if codes[i] >= 0),
+                           key=codes.__getitem__)
+            self.offsets = array('I', order)
+            self.keys = array('q')
+            self.directory = array('I')
+            for pos, i in enumerate(order):
+                if not self.keys or self.keys[-1] != codes[i]:
+                    self.keys.append(codes[i])
+                    self.directory.append(pos)
+            self.directory.append(len(order))
+
+    @classmethod
+    def from_arrays(cls, k, ival, directory, offsets, keys=None):
+        """ Return an index over existing directory, offsets and keys
+            arrays, e.g. memoryviews of shared memory, without copying """
+        index = cls.__new__(cls)
+        index.k = k
+        index.ival = ival
+        index.span = 1 + ival * (k - 1)
+        index.directory = directory
+        index.offsets = offsets
+        index.keys = keys
+        return index
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def query(self, p):
+        """ Return index hits (an array slice) for first subseq of p """
+        code = encode_kmer(p[:self.span:self.ival])
+        if code < 0 or len(p) < self.span:
+            return self.offsets[0:0]
+        if self.keys is None:
+            return self.offsets[self.directory[code]:
+                                self.directory[code + 1]]
+        i = bisect.bisect_left(self.keys, code)
+        if i == len(self.keys) or self.keys[i] != code:
+            return self.offsets[0:0]
+        return self.offsets[self.directory[i]:self.directory[i + 1]]
+
+    def nbytes(self):
+        """ Return memory footprint of the arrays in bytes """
+        size = len(self.offsets) * self.offsets.itemsize
+        size += len(self.directory) * self.directory.itemsize
+        if self.keys is not None:
+            size += len(self.keys) * self.keys.itemsize
+        return size
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+
+"""fasta_index.py: Random access to multi-record fasta files.
+
+Keeps every record (contig) of a fasta file separate and uses a
+samtools-compatible .fai sidecar index, so any region can be fetched by
+seeking straight to its bytes instead of loading the whole file.
+
+Each line of the .fai file holds, tab separated: contig name, length in
+bases, byte offset of the first base, bases per line, bytes per line.
+"""
+
+import os
+
+
+def build_fai(filename):
+    """Return a list of .fai entries for a fasta file.
+
+    Each entry is (name, length, offset, linebases, linewidth).
+    """
+    entries = []
+    name = None
+    with open(filename, 'rb') as fh:
+        pos = 0
+        for line in fh:
+            if line[:1] == b'>':
+                if name is not None:
+                    entries.append((name, length, offset, linebases,
+                                    linewidth))
+                name = line[1:].split()[0].decode()
+                length, offset = 0, pos + len(line)
+                linebases = linewidth = None
+                short_line = False  # seen a line shorter than linebases
+            elif name is not None and line.strip():
+                bases = len(line.rstrip())
+                if short_line or (linebases is not None and
+                                  bases > linebases):
+                    raise ValueError('inconsistent line length in contig %s'
+                                     % name)
+                if linebases is None:
+                    linebases, linewidth = bases, len(line)
+                elif bases < linebases:
+                    short_line = True  # only the last line may be short
+                length += bases
+            pos += len(line)
+    if name is not None:
+        entries.append((name, length, offset, linebases, linewidth))
+    return entries
+
+
+def write_fai(entries, fai_filename):
+    """Write .fai entries to fai_filename."""
+    with open(fai_filename, 'w') as fh:
+        for name, length, offset, linebases, linewidth in entries:
+            fh.write('%s\t%d\t%d\t%d\t%d\n' % (name, length, offset,
+                                               linebases or 0,
+                                               linewidth or 0))
+
+
+def read_fai(fai_filename):
+    """Return the list of entries in a .fai file."""
+    entries = []
+    with open(fai_filename) as fh:
+        for line in fh:
+            fields = line.rstrip('\n').split('\t')
+            entries.append((fields[0],) + tuple(int(f) for f in fields[1:5]))
+    return entries
+
+
+class FastaIndex(object):
+    """ Random access to the contigs of an indexed fasta file """
+
+    def __init__(self, filename, fai_filename=None):
+        """ Open filename, loading its .fai index if it is up to date
+            and building it otherwise, saving it when that is allowed """
+        self.filename = filename
+        fai_filename = fai_filename or filename + '.fai'
+        if (os.path.exists(fai_filename) and
+                os.path.getmtime(fai_filename) >=
+                os.path.getmtime(filename)):
+            entries = read_fai(fai_filename)
+        else:
+            entries = build_fai(filename)
+            try:
+                write_fai(entries, fai_filename)
+            except OSError:
+                pass  # e.g. a read-only directory: keep it in memory
+        self.names = [e[0] for e in entries]
+        self.entries = {e[0]: e[1:] for e in entries}
+        self._fh = open(filename, 'rb')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._fh.close()
+
+    def __contains__(self, contig):
+        return contig in self.entries
+
+    def __len__(self):
+        return len(self.names)
+
+    def length(self, contig):
+        """ Return the number of bases in contig """
+        return self.entries[contig][0]
+
+    def fetch(self, contig, start=0, end=None):
+        """ Return bases [start, end) of contig, 0-based """
+        length, offset, linebases, linewidth = self.entries[contig]
+        start, end, _ = slice(start, end).indices(length)
+        if start >= end:
+            return ''
+        first = offset + (start // linebases) * linewidth + start % linebases
+        last = offset + ((end - 1) // linebases) * linewidth + \
+            (end - 1) % linebases
+        self._fh.seek(first)
+        data = self._fh.read(last - first + 1)
+        return data.replace(b'\n', b'').replace(b'\r', b'').decode()
+
+    def items(self):
+        """ Yield (name, sequence) for each contig in file order """
+        for name in self.names:
+            yield name, self.fetch(name)
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+
+"""fm_index.py: An FM index (BWT with rank checkpoints) for indexing a text.
+
+Unlike the k-mer Index, the FM index finds every exact occurrence of a
+pattern of any length by backward search in O(|P|) rank queries, and
+its size is a small multiple of the text: one byte per BWT character,
+occurrence checkpoints every occ_step rows and suffix array entries
+sampled every ssa_step text offsets.
+"""
+
+import bisect
+import sys
+import time
+from array import array
+
+import numpy as np
+
+
+def suffix_array(t):
+    """Return the suffix array of bytes t, as a NumPy int64 array.
+
+    Prefix doubling on integer ranks: suffixes are ranked by their
+    first character, then by (rank of first k chars, rank of next k
+    chars) with k doubling until every suffix has its own rank.  Each
+    round is a handful of n-length integer arrays and one argsort, with
+    no per-suffix slices or Python objects.
+    """
+    n = len(t)
+    text = np.frombuffer(t, dtype=np.uint8)
+    # dense ranks of the characters, so every rank is below n
+    dense = np.cumsum(np.bincount(text, minlength=256) > 0) - 1
+    rank = dense[text]
+    del text
+    k = 1
+    while True:
+        # pair key; suffixes running off the end sort first on it
+        key = rank * (n + 1)
+        key[:n-k] += rank[k:] + 1
+        del rank
+        sa = np.argsort(key)
+        key = key[sa]
+        changed = key[1:] != key[:-1]
+        del key
+        # new rank of each row: number of key changes above it
+        ranks = np.zeros(n, dtype=np.int64)
+        np.cumsum(changed, out=ranks[1:])
+        del changed
+        rank = np.empty(n, dtype=np.int64)
+        rank[sa] = ranks
+        del ranks
+        if n == 0 or rank[sa[-1]] == n - 1:  # all ranks distinct
+            return sa
+        del sa
+        k *= 2
+
+
+class FMIndex(object):
+    """ Holds an FM index for a text T """
+
+    def __init__(self, t, k=None, occ_step=128, ssa_step=32):
+        """ Create FM index of t.  If k is given, query() looks up only
+            the first k characters of p, like Index.query, so the FM
+            index can be used wherever an Index is """
+        start = time.time()
+        self.k = k
+        self.occ_step = occ_step
+        self.ssa_step = ssa_step
+        t = t[:].encode('ascii') + b'$'  # t[:] also decodes a PackedGenome
+        self.n = len(t)
+        sa = suffix_array(t)
+        text = np.frombuffer(t, dtype=np.uint8)
+        bwt = text[sa - 1]  # t[-1] is '$' for sa[row] = 0
+        self.bwt = bwt.tobytes()
+        # offsets sampled every ssa_step positions of the text, by row
+        # (sorted rows and their offsets, in two flat arrays)
+        rows = np.nonzero(sa % ssa_step == 0)[0]
+        self.ssa_rows = array('I', rows.astype(np.uint32).tobytes())
+        self.ssa_offsets = array('I', sa[rows].astype(np.uint32).tobytes())
+        del sa
+        # first column: C[c] is the first row whose suffix starts with c
+        counts = np.bincount(bwt, minlength=256)
+        self.first = {}
+        total = 0
+        for c in np.nonzero(counts)[0].tolist():
+            self.first[c] = total
+            total += int(counts[c])
+        # occ[c][b] = number of c's in bwt[:b*occ_step]
+        blocks = self.n // occ_step
+        self.occ = {}
+        for c in self.first:
+            in_block = np.add.reduceat(bwt[:blocks * occ_step] == c,
+                                       np.arange(0, blocks * occ_step,
+                                                 occ_step),
+                                       dtype=np.int64) if blocks else []
+            self.occ[c] = array('i', [0])
+            self.occ[c].extend(np.cumsum(in_block).tolist())
+        self.build_time = time.time() - start
+
+    def __len__(self):
+        return self.n
+
+    def rank(self, c, row):
+        """ Return number of occurrences of byte c in bwt[:row] """
+        block = row // self.occ_step
+        return self.occ[c][block] + \
+            self.bwt.count(c, block * self.occ_step, row)
+
+    def row_range(self, p):
+        """ Return the [top, bottom) range of BWT rows prefixed by p """
+        top, bottom = 0, self.n
+        for c in reversed(p.encode('ascii')):
+            if c not in self.first:
+                return 0, 0
+            top = self.first[c] + self.rank(c, top)
+            bottom = self.first[c] + self.rank(c, bottom)
+            if top >= bottom:
+                return 0, 0
+        return top, bottom
+
+    def resolve(self, row):
+        """ Return the text offset of the suffix at row """
+        steps = 0
+        while True:
+            i = bisect.bisect_left(self.ssa_rows, row)
+            if i < len(self.ssa_rows) and self.ssa_rows[i] == row:
+                return self.ssa_offsets[i] + steps
+            c = self.bwt[row]
+            row = self.first[c] + self.rank(c, row)  # LF mapping
+            steps += 1
+
+    def count(self, p):
+        """ Return number of occurrences of p """
+        top, bottom = self.row_range(p)
+        return bottom - top
+
+    def occurrences(self, p):
+        """ Return sorted offsets of every occurrence of p """
+        top, bottom = self.row_range(p)
+        return sorted(self.resolve(row) for row in range(top, bottom))
+
+    def query(self, p):
+        """ Return index hits for first k-mer of p (all of p if no k) """
+        return self.occurrences(p[:self.k] if self.k else p)
+
+    def nbytes(self):
+        """ Return memory held by the index's tables in bytes """
+        size = sys.getsizeof(self.bwt)
+        size += sys.getsizeof(self.ssa_rows) + sys.getsizeof(self.ssa_offsets)
+        size += sys.getsizeof(self.occ) + sys.getsizeof(self.first)
+        return size + sum(sys.getsizeof(occ) for occ in self.occ.values())
+
+if __name__ == '__main__':
+    import tracemalloc
+    from better_matching import readGenome
+    from pigeonhole import Index
+
+    genome = readGenome('chr1.GRCh38.excerpt.fasta')
+    tracemalloc.start()
+    fm = FMIndex(genome)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print("FM index build: %.2fs, ~%.1f MB, peak %.1f MB during build"
+          % (fm.build_time, fm.nbytes() / 1e6, peak / 1e6))
+    start = time.time()
+    tracemalloc.start()
+    index = Index(genome, 8)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    index_bytes = sys.getsizeof(index.index) + sum(
+        sys.getsizeof(e) + sys.getsizeof(e[0]) for e in index.index)
+    print("8-mer Index build: %.2fs, ~%.1f MB, peak %.1f MB during build"
+          % (time.time() - start, index_bytes / 1e6, peak / 1e6))
+    patterns = [genome[i:i+24] for i in range(0, len(genome) - 24, 997)]
+    start = time.time()
+    for p in patterns:
+        offset = fm.query(p)[0]
+        assert genome[offset:offset+24] == p
+    elapsed = time.time() - start
+    print("%d queries of length 24: %.0f queries/s"
+          % (len(patterns), len(patterns) / elapsed))
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+
+"""index_store.py: Save Index / SubseqIndex to disk and mmap them back.
+
+Only the offsets are stored, in index (sorted k-mer) order; the k-mers
+themselves are read from the genome when querying, so loading a saved
+index is a single mmap with nothing to unpickle.  A SHA-256 checksum of
+the genome and the index parameters is stored in the header, and a file
+that does not match the genome it is loaded against is rejected.
+
+File layout (little endian):
+    header   magic b'DNAIDX', version (uint16), k (uint32),
+             ival (uint32, 0 for a plain Index), count (uint64),
+             checksum (32 bytes)
+    offsets  count uint32 offsets
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from pigeonhole import Index, SubseqIndex
+
+MAGIC = b'DNAIDX'
+VERSION = 1
+HEADER = struct.Struct('<6sHIIQ32s')
+
+
+class StaleIndexError(ValueError):
+    """ Raised when a saved index does not match the genome or params """
+
+
+def checksum(t, k, ival):
+    """Return SHA-256 digest tying a genome to index parameters."""
+    digest = hashlib.sha256(struct.pack('<IIQ', k, ival, len(t)))
+    digest.update(t[:].encode('ascii'))
+    return digest.digest()
+
+
+def save_index(index, t, filename):
+    """Write an Index or SubseqIndex of genome t to filename."""
+    ival = getattr(index, 'ival', 0)
+    with open(filename, 'wb') as fh:
+        fh.write(HEADER.pack(MAGIC, VERSION, index.k, ival,
+                             len(index.index), checksum(t, index.k, ival)))
+        offsets = array('I', [offset for _, offset in index.index])
+        if sys.byteorder == 'big':
+            offsets.byteswap()
+        fh.write(offsets.tobytes())
+
+
+class MappedIndex(object):
+    """ A saved Index or SubseqIndex, memory-mapped from disk """
+
+    def __init__(self, filename, t):
+        """ Map filename, checking that it was built from genome t """
+        with open(filename, 'rb') as fh:
+            self._mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mm) < HEADER.size:
+            self._mm.close()
+            raise ValueError('%s is too short for an index header'
+                             % filename)
+        magic, version, k, ival, count, digest = \
+            HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self._mm.close()
+            raise ValueError('%s is not a saved index' % filename)
+        if version != VERSION:
+            self._mm.close()
+            raise ValueError('unsupported index version %d' % version)
+        if len(self._mm) != HEADER.size + 4 * count:
+            self._mm.close()
+            raise ValueError('%s is truncated or has trailing data'
+                             % filename)
+        if digest != checksum(t, k, ival):
+            self._mm.close()
+            raise StaleIndexError('%s was built from a different genome or '
+                                  'parameters' % filename)
+        self.t = t
+        self.k = k  # num characters per k-mer or subsequence
+        if ival:
+            self.ival = ival
+        self._step = ival or 1
+        self.span = 1 + self._step * (k - 1)
+        self.offsets = memoryview(self._mm)[HEADER.size:
+                                            HEADER.size + 4 * count].cast('I')
+        if sys.byteorder == 'big':  # stored little endian; copy and swap
+            self.offsets = array('I', self.offsets)
+            self.offsets.byteswap()
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def close(self):
+        if isinstance(self.offsets, memoryview):
+            self.offsets.release()
+        self._mm.close()
+
+    def _key(self, i):
+        offset = self.offsets[i]
+        return self.t[offset:offset+self.span:self._step]
+
+    def query(self, p):
+        """ Return index hits for first k-mer or subseq of p """
+        kmer = p[:self.span:self._step]
+        lo, hi = 0, len(self.offsets)
+        while lo < hi:  # binary search for first entry >= kmer
+            mid = (lo + hi) // 2
+            if self._key(mid) < kmer:
+                lo = mid + 1
+            else:
+                hi = mid
+        hits = []
+        while lo < len(self.offsets) and self._key(lo) == kmer:
+            hits.append(self.offsets[lo])
+            lo += 1
+        return hits
+
+
+def load_index(filename, t, k, ival=None):
+    """Return the saved index in filename if it matches t, k and ival.
+
+    Otherwise (including when filename is not a valid index of the
+    current version) build an Index (or SubseqIndex if ival is given),
+    save it to filename and return it.
+    """
+    if os.path.exists(filename):
+        try:
+            index = MappedIndex(filename, t)
+        except (ValueError, struct.error):
+            pass  # stale, truncated, foreign or older format: rebuild
+        else:
+            if index.k == k and getattr(index, 'ival', None) == ival:
+                return index
+            index.close()
+    if ival is None:
+        index = Index(t, k)
+    else:
+        index = SubseqIndex(t, k, ival)
+    save_index(index, t, filename)
+    return index
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+
+"""packed_genome.py: A memory-mapped, 2-bit packed reference genome.
+
+The genome is written once from a fasta file and can then be opened by
+any number of processes, which all share the same mapped pages.  Bases
+are packed four to a byte (A=0, C=1, G=2, T=3, first base in the high
+bits) and any non-ACGT character is recorded as N in a side table of
+runs, so the file takes about a quarter of the size of the sequence.
+
+File layout (little endian):
+    header   magic b'DNA2', version (uint32), length (uint64),
+             number of N runs (uint64)
+    bases    ceil(length / 4) packed bytes
+    N runs   (start, end) uint64 pairs, sorted by start
+"""
+
+import array
+import bisect
+import mmap
+import struct
+
+MAGIC = b'DNA2'
+VERSION = 1
+HEADER = struct.Struct('<4sIQQ')
+
+# packed byte -> the four bases it holds
+_DECODE = [bytes(b'ACGT'[(byte >> shift) & 3] for shift in (6, 4, 2, 0))
+           for byte in range(256)]
+# four bases -> packed byte
+_ENCODE = {_DECODE[byte]: byte for byte in range(256)}
+
+
+def _pack(bases):
+    """Return packed bytes for an ACGT-only bytes object."""
+    if len(bases) % 4:
+        bases += b'A' * (4 - len(bases) % 4)  # pad final byte
+    return bytes(_ENCODE[bases[i:i+4]] for i in range(0, len(bases), 4))
+
+
+def writePackedGenome(fasta_filename, packed_filename):
+    """Pack the sequence of a fasta file into packed_filename.
+
+    As with readGenome, header lines are skipped and all records are
+    joined into one sequence.  Return the number of bases written.
+    """
+    length = 0
+    runs = []
+    pending = bytearray()  # bases not yet packed, fewer than a chunk
+    with open(fasta_filename, 'rb') as fa, open(packed_filename, 'wb') as out:
+        out.write(HEADER.pack(MAGIC, VERSION, 0, 0))  # rewritten below
+        for line in fa:
+            if line[:1] == b'>':
+                continue  # ignore header line with genome information
+            line = line.rstrip().upper()
+            if line.translate(None, b'ACGT'):
+                # record runs of non-ACGT characters as N
+                for i, c in enumerate(line):
+                    if c not in b'ACGT':
+                        if runs and runs[-1][1] == length + i:
+                            runs[-1][1] += 1
+                        else:
+                            runs.append([length + i, length + i + 1])
+                line = bytes(c if c in b'ACGT' else 65 for c in line)
+            pending += line
+            length += len(line)
+            if len(pending) >= 1 << 16:
+                cut = len(pending) - len(pending) % 4
+                out.write(_pack(bytes(pending[:cut])))
+                del pending[:cut]
+        out.write(_pack(bytes(pending)))
+        flat = array.array('Q', [pos for run in runs for pos in run])
+        out.write(flat.tobytes())
+        out.seek(0)
+        out.write(HEADER.pack(MAGIC, VERSION, length, len(runs)))
+    return length
+
+
+class PackedGenome(object):
+    """ A read-only, memory-mapped view of a packed genome.
+
+        Supports len(), base access and (stepped) slicing, returning
+        strings, so it can stand in for the genome string passed to the
+        matching functions and index classes. """
+
+    def __init__(self, filename):
+        with open(filename, 'rb') as fh:
+            self._mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.length, nruns = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError('%s is not a packed genome' % filename)
+        if version != VERSION:
+            raise ValueError('unsupported packed genome version %d'
+                             % version)
+        self._base = HEADER.size  # offset of packed bases
+        runs_at = self._base + (self.length + 3) // 4
+        flat = array.array('Q')
+        flat.frombytes(self._mm[runs_at:runs_at + 16 * nruns])
+        self.n_starts = flat[0::2]
+        self.n_ends = flat[1::2]
+
+    def __len__(self):
+        return self.length
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._mm.close()
+
+    def _is_n(self, i):
+        """ Return True if offset i falls in an N run """
+        r = bisect.bisect_right(self.n_starts, i) - 1
+        return r >= 0 and i < self.n_ends[r]
+
+    def _decode(self, start, stop):
+        """ Return bases [start, stop) as bytes """
+        if start >= stop:
+            return b''
+        first, last = start >> 2, (stop + 3) >> 2
+        packed = self._mm[self._base + first:self._base + last]
+        seq = bytearray(b''.join(map(_DECODE.__getitem__, packed)))
+        seq = seq[start - 4 * first:stop - 4 * first]
+        # overwrite bases covered by N runs
+        r = max(bisect.bisect_right(self.n_starts, start) - 1, 0)
+        while r < len(self.n_starts) and self.n_starts[r] < stop:
+            lo, hi = max(self.n_starts[r], start), min(self.n_ends[r], stop)
+            if lo < hi:
+                seq[lo - start:hi - start] = b'N' * (hi - lo)
+            r += 1
+        return bytes(seq)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.length)
+            if step < 0:
+                return self._decode(stop + 1, start + 1)[::-1][::-step] \
+                    .decode()
+            seq = self._decode(start, stop)
+            return (seq if step == 1 else seq[::step]).decode()
+        if key < 0:
+            key += self.length
+        if not 0 <= key < self.length:
+            raise IndexError('genome index out of range')
+        if self._is_n(key):
+            return 'N'
+        byte = self._mm[self._base + (key >> 2)]
+        return 'ACGT'[(byte >> (6 - 2 * (key & 3))) & 3]
+
+    def base_code(self, i):
+        """ Return the 2-bit code (A=0, C=1, G=2, T=3) of base i,
+            or -1 for N """
+        if self._is_n(i):
+            return -1
+        byte = self._mm[self._base + (i >> 2)]
+        return (byte >> (6 - 2 * (i & 3))) & 3
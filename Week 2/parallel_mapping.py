@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+
+"""parallel_mapping.py: Map reads on a process pool with a shared index.
+
+The genome and the arrays of a CompactIndex are copied once into
+multiprocessing.shared_memory blocks.  Worker processes attach to them
+by name, so nothing large is pickled to a worker; only read batches go
+out and hit lists come back, in input order.
+"""
+
+import os
+import time
+from multiprocessing import Pool, shared_memory
+
+from better_matching import map_read
+from compact_index import CompactIndex
+
+# set in each worker by _attach
+_worker = {}
+
+
+class SharedGenome(object):
+    """ Genome held in a shared memory buffer; slices decode to str """
+
+    def __init__(self, buf, length):
+        self.buf = buf
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.length)
+            return bytes(self.buf[start:stop:step]).decode('ascii')
+        return chr(self.buf[key])
+
+
+def _share(data):
+    """Return a new shared memory block holding a copy of data."""
+    data = memoryview(data).cast('B')
+    shm = shared_memory.SharedMemory(create=True, size=max(len(data), 1))
+    shm.buf[:len(data)] = data
+    return shm
+
+
+def _attach(names, sizes, k, ival, n):
+    """Pool initializer: attach to the shared genome and index."""
+    blocks = [shared_memory.SharedMemory(name=name) if name else None
+              for name in names]
+    # blocks may be rounded up to a page, so trim them to the data size
+    genome, directory, offsets, keys = [
+        shm.buf[:size] if shm else None for shm, size in zip(blocks, sizes)]
+    _worker['blocks'] = blocks  # keep the mappings alive
+    _worker['t'] = SharedGenome(genome, sizes[0])
+    _worker['index'] = CompactIndex.from_arrays(
+        k, ival, directory.cast('I'), offsets.cast('I'),
+        keys.cast('q') if keys is not None else None)
+    _worker['n'] = n
+
+
+def _map_batch(reads):
+    t, index, n = _worker['t'], _worker['index'], _worker['n']
+    return [map_read(read, t, index, n) for read in reads]
+
+
+def _batches(reads, batch_size):
+    batch = []
+    for read in reads:
+        batch.append(read)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def parallel_map_reads(reads, t, n, k=8, ival=1, index=None, processes=None,
+                       batch_size=256):
+    """Yield map_read results for each read, in input order.
+
+    reads can be any iterable (e.g. sequences from iterFastq).  index is
+    a CompactIndex of t, built with k and ival if not given.  Batches of
+    batch_size reads are handed out to a pool of processes workers
+    (default: one per CPU).
+    """
+    if index is None:
+        index = CompactIndex(t, k, ival)
+    arrays = [t[:].encode('ascii'), index.directory, index.offsets,
+              index.keys]
+    blocks = [_share(data) if data is not None else None for data in arrays]
+    names = [shm.name if shm else None for shm in blocks]
+    sizes = [memoryview(data).nbytes if data is not None else 0
+             for data in arrays]
+    try:
+        with Pool(processes, initializer=_attach,
+                  initargs=(names, sizes, index.k, index.ival, n)) as pool:
+            for results in pool.imap(_map_batch,
+                                     _batches(reads, batch_size)):
+                for result in results:
+                    yield result
+    finally:
+        for shm in blocks:
+            if shm:
+                shm.close()
+                shm.unlink()
+
+
+if __name__ == '__main__':
+    import random
+    from better_matching import readGenome
+
+    genome = readGenome('chr1.GRCh38.excerpt.fasta')
+    random.seed(0)
+    reads = []
+    for _ in range(20000):  # 30 bp reads with up to 2 substitutions
+        i = random.randrange(len(genome) - 30)
+        read = list(genome[i:i+30])
+        for _ in range(random.randrange(3)):
+            read[random.randrange(30)] = random.choice('ACGT')
+        reads.append(''.join(read))
+    index = CompactIndex(genome, 8)
+    base = None
+    for processes in sorted({1, 2, 4, 8, os.cpu_count()}):
+        start = time.time()
+        mapped = sum(1 for best, _, _, _ in
+                     parallel_map_reads(reads, genome, 2, index=index,
+                                        processes=processes)
+                     if best is not None)
+        elapsed = time.time() - start
+        base = base or elapsed
+        print("%2d workers: %.2fs, %.0f reads/s, speedup %.2fx (%d mapped)"
+              % (processes, elapsed, len(reads) / elapsed, base / elapsed,
+                 mapped))
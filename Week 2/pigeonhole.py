@@ -6,6 +6,8 @@ import bisect
 
 __author__ = "Jason Tham"
 
+_COMPLEMENT = str.maketrans('ACGTN', 'TGCAN')
+
 
 class Index(object):
     """ Holds a substring index for a text T """
@@ -30,6 +32,57 @@ class Index(object):
             i += 1
         return hits
 
+
+class CanonicalIndex(object):
+    """Holds a strand-aware k-mer index for a text T.
+
+    Each k-mer is stored once under its canonical form, the smaller of
+    itself and its reverse complement, so a k-mer and its reverse
+    complement share index entries and one lookup finds both strands.
+    """
+
+    canonical = True
+
+    def __init__(self, t, k):
+        """Create index from all substrings of t of length k."""
+        self.k = k  # k-mer length (k)
+        self.index = []
+        for i in range(len(t) - k + 1):  # for each k-mer
+            kmer = t[i:i+k]
+            rc = kmer.translate(_COMPLEMENT)[::-1]
+            # add (canonical k-mer, offset, strand of t's k-mer) triple
+            if kmer <= rc:
+                self.index.append((kmer, i, '+'))
+            else:
+                self.index.append((rc, i, '-'))
+        self.index.sort()  # alphabetize by canonical k-mer
+
+    def query(self, p):
+        """Return (offset, strand) hits for first k-mer of p.
+
+        strand is '+' where the k-mer itself occurs at offset and '-'
+        where its reverse complement does; a k-mer that is its own
+        reverse complement is reported on both strands.
+        """
+        kmer = p[:self.k]  # query with first k-mer
+        rc = kmer.translate(_COMPLEMENT)[::-1]
+        canonical, strand = (kmer, '+') if kmer <= rc else (rc, '-')
+        i = bisect.bisect_left(self.index, (canonical, -1))
+        hits = []
+        while i < len(self.index):  # collect matching index entries
+            if self.index[i][0] != canonical:
+                break
+            offset = self.index[i][1]
+            if kmer == rc:
+                hits.extend([(offset, '+'), (offset, '-')])
+            elif self.index[i][2] == strand:
+                hits.append((offset, '+'))
+            else:
+                hits.append((offset, '-'))
+            i += 1
+        return hits
+
+
 class ApproxIndex(object):
     """Holds a substring index for a text T.
 
@@ -0,0 +1,61 @@
+"""NumPy-vectorized exact and k-mismatch matching.
+
+Drop-in replacements for naive and naive_2mm in better_matching.py.
+Instead of comparing one character at a time, the text is encoded as a
+uint8 array and the mismatches of every alignment are counted at once,
+one pattern column at a time.  The text is processed in fixed-size
+chunks so memory stays bounded however long it is.
+"""
+
+import numpy as np
+
+
+def encode(s):
+    """Return a str or bytes sequence as a uint8 array."""
+    if isinstance(s, str):
+        s = s.encode('ascii')
+    return np.frombuffer(s, dtype=np.uint8)
+
+
+def naive_mm(p, t, n=2, chunk_size=1 << 20):
+    """Return offsets where p matches t with at most n mismatches.
+
+    t can be any sequence whose slices are strings or bytes, e.g. a str
+    or a PackedGenome; only chunk_size alignments are encoded at a time.
+    """
+    pat = encode(p)
+    m = len(pat)
+    num_alignments = len(t) - m + 1
+    occurrences = []
+    for start in range(0, num_alignments, chunk_size):
+        stop = min(start + chunk_size, num_alignments)
+        text = encode(t[start:stop+m-1])
+        # until n+1 columns are compared no alignment can be ruled out,
+        # so count mismatches densely over the whole chunk
+        dense = min(n + 1, m)
+        mismatches = np.zeros(stop - start, dtype=np.int32)
+        for j in range(dense):
+            mismatches += text[j:j+stop-start] != pat[j]
+        # from then on only keep alignments still within budget
+        keep = mismatches <= n
+        offsets = np.flatnonzero(keep)
+        mismatches = mismatches[keep]
+        for j in range(dense, m):
+            if len(offsets) == 0:
+                break
+            mismatches += text[offsets + j] != pat[j]
+            keep = mismatches <= n
+            offsets = offsets[keep]
+            mismatches = mismatches[keep]
+        occurrences.extend((offsets + start).tolist())
+    return occurrences
+
+
+def naive(p, t, chunk_size=1 << 20):
+    """Return offsets where p matches t exactly."""
+    return naive_mm(p, t, 0, chunk_size)
+
+
+def naive_2mm(p, t, chunk_size=1 << 20):
+    """Return offsets where p matches t with at most 2 mismatches."""
+    return naive_mm(p, t, 2, chunk_size)
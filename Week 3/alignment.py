@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+
+"""Linear-memory edit-distance alignment with traceback.
+
+editDistance and matchDistance keep the whole DP matrix and return only
+a number.  Here scores are computed with two rolling rows, and the
+alignment itself is recovered with Hirschberg's divide and conquer, so
+memory stays O(|x| + |y|).  x is the read and y the reference; an
+alignment is a list of operations:
+
+    '='  x and y characters match
+    'X'  mismatch (substitution)
+    'I'  character of x not in y (insertion to the reference)
+    'D'  character of y not in x (deletion from the reference)
+"""
+
+
+def lastRow(x, y, free_start=False):
+    """Return the last row of the edit distance matrix of x and y.
+
+    With free_start, x may start anywhere in y (top row all zeros).
+    """
+    prev = [0] * (len(y)+1) if free_start else list(range(len(y)+1))
+    for i in range(1, len(x)+1):
+        cur = [i] + [0] * len(y)
+        xc = x[i-1]
+        for j in range(1, len(y)+1):
+            dist = prev[j-1] if xc == y[j-1] else prev[j-1] + 1
+            if prev[j] + 1 < dist:
+                dist = prev[j] + 1
+            if cur[j-1] + 1 < dist:
+                dist = cur[j-1] + 1
+            cur[j] = dist
+        prev = cur
+    return prev
+
+
+def hirschberg(x, y):
+    """Return an optimal global alignment of x and y as a list of ops."""
+    if len(x) == 0:
+        return ['D'] * len(y)
+    if len(y) == 0:
+        return ['I'] * len(x)
+    if len(x) == 1:
+        j = y.find(x)
+        if j == -1:  # substitute against the first character
+            return ['X'] + ['D'] * (len(y) - 1)
+        return ['D'] * j + ['='] + ['D'] * (len(y) - j - 1)
+    mid = len(x) // 2
+    # cost of x[:mid] against each prefix of y, and of x[mid:] against
+    # each suffix of y; the best split point of y is where they add up
+    # to the least
+    left = lastRow(x[:mid], y)
+    right = lastRow(x[mid:][::-1], y[::-1])
+    split = min(range(len(y)+1), key=lambda j: left[j] + right[len(y)-j])
+    return hirschberg(x[:mid], y[:split]) + hirschberg(x[mid:], y[split:])
+
+
+def align(x, y, semiglobal=False):
+    """Return (distance, start, ops) aligning x to y.
+
+    In global mode start is 0 and ops span all of y.  In semi-global
+    mode x is aligned to the best-matching substring y[start:end] (the
+    leftmost one on ties) and ops span only that substring.
+    """
+    if not semiglobal:
+        ops = hirschberg(x, y)
+        return sum(op != '=' for op in ops), 0, ops
+    row = lastRow(x, y, free_start=True)
+    end = min(range(len(y)+1), key=row.__getitem__)
+    # align backwards from end, with the start left free
+    back = lastRow(x[::-1], y[:end][::-1], free_start=False)
+    start = end - min(range(end+1), key=lambda j: (back[j], -j))
+    ops = hirschberg(x, y[start:end])
+    return row[end], start, ops
+
+
+def cigar(ops, extended=False):
+    """Return the CIGAR string of a list of ops.
+
+    Matches and mismatches are both reported as M unless extended is
+    True, in which case they are kept as = and X.
+    """
+    if not extended:
+        ops = ['M' if op in '=X' else op for op in ops]
+    runs = []
+    for op in ops:
+        if runs and runs[-1][1] == op:
+            runs[-1][0] += 1
+        else:
+            runs.append([1, op])
+    return ''.join('%d%s' % (n, op) for n, op in runs)
@@ -1,10 +1,22 @@
 #!/usr/bin/env python
 
 """Week 3 homework, algorithms for assembly and overlaps."""
+import gzip
+import io
+from collections import defaultdict
 from itertools import permutations
+from multiprocessing import Pool
 
 
-def editDistance(x, y):
+def editDistance(x, y, max_dist=None):
+    """Return the edit distance between x and y.
+
+    With max_dist given, only a diagonal band of width 2*max_dist+1 is
+    computed and max_dist+1 is returned as soon as the distance is known
+    to be greater than max_dist.
+    """
+    if max_dist is not None:
+        return bandedEditDistance(x, y, max_dist)
     # Create distance matrix
     D = []
     for i in range(len(x)+1):
@@ -28,6 +40,39 @@ def editDistance(x, y):
     return D[-1][-1]
 
 
+def bandedEditDistance(x, y, k):
+    """Return the edit distance of x and y, or k+1 if it is greater than k.
+
+    Cells more than k off the main diagonal always cost more than k, so
+    each row only keeps the 2k+1 cells of the band: row[d] holds
+    D[i][i+d-k].  The scan stops early once a whole row exceeds k.
+    """
+    if abs(len(x) - len(y)) > k:
+        return k + 1
+    inf = k + 1
+    width = 2 * k + 1
+    # Row 0: D[0][j] = j
+    prev = [inf] * k + list(range(min(k, len(y)) + 1))
+    prev += [inf] * (width - len(prev))
+    for i in range(1, len(x)+1):
+        cur = [inf] * width
+        for d in range(max(0, k - i), min(width, len(y) - i + k + 1)):
+            j = i + d - k
+            if j == 0:
+                cur[d] = i  # first column
+                continue
+            dist = prev[d] if x[i-1] == y[j-1] else prev[d] + 1
+            if d + 1 < width and prev[d+1] + 1 < dist:
+                dist = prev[d+1] + 1  # from D[i-1][j]
+            if d > 0 and cur[d-1] + 1 < dist:
+                dist = cur[d-1] + 1  # from D[i][j-1]
+            cur[d] = dist
+        if min(cur) > k:
+            return k + 1
+        prev = cur
+    return min(prev[len(y) - len(x) + k], k + 1)
+
+
 def matchDistance(x, y):
     # Create distance matrix
     D = []
@@ -56,6 +101,52 @@ def matchDistance(x, y):
     return match
 
 
+def myersMatchDistance(p, t, positions=False):
+    """Return the smallest edit distance between p and any substring of t.
+
+    Same result as matchDistance, using Myers' bit-vector algorithm: the
+    column of the DP matrix is kept as vertical +1/-1 delta bit vectors
+    (one bit per character of p), so t is streamed once with a constant
+    number of word operations per character.  With positions=True,
+    return (distance, ends) where ends lists every end offset e such
+    that p matches t[s:e] for some s at that distance.
+    """
+    m = len(p)
+    if m == 0:  # the empty pattern matches at every offset
+        return (0, list(range(len(t) + 1))) if positions else 0
+    mask = (1 << m) - 1
+    high = 1 << (m - 1)
+    peq = {}  # character -> bit mask of its positions in p
+    for i, c in enumerate(p):
+        peq[c] = peq.get(c, 0) | (1 << i)
+    pv, mv = mask, 0  # first column: D[i][0] = i
+    score = best = m
+    ends = [0]
+    for j, c in enumerate(t, 1):
+        eq = peq.get(c, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & mask)
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        # top row is all zeros in semi-global matching, so shift in 0
+        ph = (ph << 1) & mask
+        mh = (mh << 1) & mask
+        pv = mh | (~(xv | ph) & mask)
+        mv = ph & xv
+        if score < best:
+            best = score
+            ends = [j]
+        elif score == best and positions:
+            ends.append(j)
+    if positions:
+        return best, ends
+    return best
+
+
 def readGenome(filename):
     """Return a sequence from a fasta file."""
     genome = ''
@@ -67,20 +158,50 @@ def readGenome(filename):
     return genome
 
 
-def readFastq(filename):
-    """Return a tuple of sequences and qualities from a fastq file."""
-    sequences = []
-    qualities = []
-    with open(filename) as fh:
+def openFastq(filename, buffer_size=1 << 20):
+    """Return a buffered binary handle, decompressing gzip input."""
+    with open(filename, 'rb') as fh:
+        gzipped = fh.read(2) == b'\x1f\x8b'  # gzip magic number
+    if gzipped:
+        return io.BufferedReader(gzip.open(filename, 'rb'), buffer_size)
+    return open(filename, 'rb', buffering=buffer_size)
+
+
+def iterFastq(filename, batch_size=None, buffer_size=1 << 20):
+    """Yield (name, sequence, quality) records from a fastq file.
+
+    Records are read lazily, so memory stays flat however large the
+    file is.  If batch_size is given, lists of up to batch_size records
+    are yielded instead of single records.
+    """
+    batch = []
+    with openFastq(filename, buffer_size) as fh:
         while True:
-            fh.readline()  # skip name line
+            name = fh.readline().rstrip()  # name line, starts with '@'
             seq = fh.readline().rstrip()  # read base sequence
             fh.readline()  # skip placeholder line
             qual = fh.readline().rstrip()  # base quality line
             if len(seq) == 0:
                 break
-            sequences.append(seq)
-            qualities.append(qual)
+            record = (name[1:].decode(), seq.decode(), qual.decode())
+            if batch_size is None:
+                yield record
+                continue
+            batch.append(record)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def readFastq(filename):
+    """Return a tuple of sequences and qualities from a fastq file."""
+    sequences = []
+    qualities = []
+    for _, seq, qual in iterFastq(filename):
+        sequences.append(seq)
+        qualities.append(qual)
     return sequences, qualities
 
 
@@ -108,3 +229,66 @@ def naive_overlap_map(reads, k):
         if olen > 0:
             olaps[(a, b)] = olen
     return olaps
+
+
+def kmer_read_index(reads, k):
+    """Return dict mapping each k-mer to the set of ids of reads with it."""
+    index = defaultdict(set)
+    for rid, read in enumerate(reads):
+        for i in range(len(read) - k + 1):
+            index[read[i:i+k]].add(rid)
+    return index
+
+
+# shared with worker processes by _init_overlap_worker
+_overlap_state = {}
+
+
+def _init_overlap_worker(reads, index, k):
+    _overlap_state.update(reads=reads, index=index, k=k)
+
+
+def _overlap_chunk(ids):
+    """Return (a, b, olen) edges out of each read id in ids."""
+    reads, index, k = (_overlap_state['reads'], _overlap_state['index'],
+                       _overlap_state['k'])
+    edges = []
+    for a in ids:
+        read_a = reads[a]
+        if len(read_a) < k:
+            continue
+        # b can only overlap a by >= k if it contains a's k-suffix
+        for b in index.get(read_a[-k:], ()):
+            if b != a:
+                olen = overlap(read_a, reads[b], min_length=k)
+                if olen > 0:
+                    edges.append((a, b, olen))
+    return edges
+
+
+def overlap_edges(reads, k, processes=1, chunk_size=1000):
+    """Return list of (a, b, olen) edges between read ids a and b.
+
+    Only pairs where b contains a's length-k suffix are checked with
+    overlap(), instead of every ordered pair.  With processes > 1, the
+    reads are split into chunks of chunk_size ids, checked in parallel.
+    """
+    index = kmer_read_index(reads, k)
+    chunks = [range(i, min(i + chunk_size, len(reads)))
+              for i in range(0, len(reads), chunk_size)]
+    if processes == 1:
+        _init_overlap_worker(reads, index, k)
+        results = map(_overlap_chunk, chunks)
+        return [edge for edges in results for edge in edges]
+    with Pool(processes, initializer=_init_overlap_worker,
+              initargs=(reads, index, k)) as pool:
+        results = pool.map(_overlap_chunk, chunks)
+    return [edge for edges in results for edge in edges]
+
+
+def overlap_map(reads, k, processes=1):
+    """Return the same overlap dictionary as naive_overlap_map."""
+    olaps = {}
+    for a, b, olen in overlap_edges(reads, k, processes):
+        olaps[(reads[a], reads[b])] = olen
+    return olaps
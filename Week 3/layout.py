@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+
+"""layout.py: Layout stage of overlap-layout-consensus assembly.
+
+An overlap graph holds an edge for every pair of reads that overlap by
+at least k, so a read overlaps each of its next few dozen neighbours and
+most edges are implied by shorter ones: if a -> b and b -> c, then
+a -> c says nothing new.  Myers' transitive reduction (2005, "The
+fragment assembly string graph") removes those edges.  What is left is
+mostly chains of reads with one way in and one way out; those are
+collapsed into unitigs, and each unitig is spelled out as a contig.
+
+Edges are (a, b, olen) tuples between read ids, as overlap_edges
+returns; a {(read_a, read_b): olen} map from overlap_map or
+naive_overlap_map can be converted with edge_list.
+"""
+
+
+def edge_list(olaps):
+    """Return (reads, edges) for an overlap map {(a, b): olen}.
+
+    reads lists each read once, in the order first seen, and edges are
+    (a, b, olen) tuples of positions in reads.
+    """
+    ids = {}
+    reads = []
+    edges = []
+    for (a, b), olen in olaps.items():
+        for read in (a, b):
+            if read not in ids:
+                ids[read] = len(reads)
+                reads.append(read)
+        edges.append((ids[a], ids[b], olen))
+    return reads, edges
+
+
+def reduce_edges(reads, edges, fuzz=0):
+    """Return the edges left by transitive reduction.
+
+    Each edge a -> b has a hang, len(reads[b]) - olen: how far b sticks
+    out past a.  a -> c is removed when there is a path a -> b -> c whose
+    hangs add up to that of a -> c (within fuzz).  As in Myers'
+    algorithm, a's out-edges are visited shortest hang first, only
+    neighbours not already removed are expanded, and each neighbour's
+    out-edges are only scanned up to a's longest hang, so the work per
+    read is about one neighbour's degree rather than the degree squared.
+    """
+    out = [[] for _ in reads]
+    for a, b, olen in edges:
+        out[a].append((len(reads[b]) - olen, b, olen))
+    for adj in out:
+        adj.sort()
+    kept = []
+    for a, adj in enumerate(out):
+        if not adj:
+            continue
+        hangs = {b: hang for hang, b, _ in adj}
+        longest = adj[-1][0] + fuzz
+        removed = set()
+        for hang, b, _ in adj:
+            if b in removed:
+                continue
+            for hang2, c, _ in out[b]:
+                if hang + hang2 > longest:
+                    break
+                if c in hangs and c not in removed and \
+                        abs(hang + hang2 - hangs[c]) <= fuzz:
+                    removed.add(c)
+        kept.extend((a, b, olen) for _, b, olen in adj if b not in removed)
+    return kept
+
+
+def unitig_paths(n, edges):
+    """Return the unitigs of a graph on read ids 0..n-1.
+
+    Each unitig is a list of (read id, olen) steps, olen being the
+    overlap with the previous read (0 for the first).  An edge a -> b is
+    followed when it is a's only way out and b's only way in; every read
+    ends up in exactly one unitig, cycles of such edges included.
+    """
+    succ = [None] * n  # the one out-edge (b, olen), if there is only one
+    out_degree = [0] * n
+    in_degree = [0] * n
+    for a, b, olen in edges:
+        out_degree[a] += 1
+        in_degree[b] += 1
+        succ[a] = (b, olen)
+
+    def joined(a):
+        """Return the edge a -> b if it is unambiguous, else None."""
+        if out_degree[a] == 1 and in_degree[succ[a][0]] == 1:
+            return succ[a]
+        return None
+
+    has_pred = [False] * n  # reached by an unambiguous edge
+    for a in range(n):
+        step = joined(a)
+        if step is not None:
+            has_pred[step[0]] = True
+    used = [False] * n
+    paths = []
+
+    def walk(start):
+        path = [(start, 0)]
+        used[start] = True
+        step = joined(start)
+        while step is not None and not used[step[0]]:
+            path.append(step)
+            used[step[0]] = True
+            step = joined(step[0])
+        paths.append(path)
+
+    for rid in range(n):
+        if not has_pred[rid]:
+            walk(rid)
+    # whatever is left lies on cycles of unambiguous edges
+    for rid in range(n):
+        if not used[rid]:
+            walk(rid)
+    return paths
+
+
+def spell(reads, path):
+    """Return the sequence of a unitig path."""
+    return reads[path[0][0]] + ''.join(reads[rid][olen:]
+                                       for rid, olen in path[1:])
+
+
+def layout(reads, edges, fuzz=0):
+    """Return contigs, one per unitig of the reduced overlap graph."""
+    edges = reduce_edges(reads, edges, fuzz)
+    return [spell(reads, path) for path in unitig_paths(len(reads), edges)]
+
+
+if __name__ == '__main__':
+    import time
+    from assembly import readFastq, overlap_edges
+
+    reads, _ = readFastq('ERR266411_1.for_asm.fastq')
+    edges = overlap_edges(reads, 30)
+    start = time.time()
+    reduced = reduce_edges(reads, edges)
+    paths = unitig_paths(len(reads), reduced)
+    elapsed = time.time() - start
+    print("%d reads, %d edges -> %d after reduction, %d unitigs (%.2fs)"
+          % (len(reads), len(edges), len(reduced), len(paths), elapsed))
+    contigs = sorted((spell(reads, path) for path in paths), key=len)
+    print("longest contigs:", [len(contig) for contig in contigs[-5:]])
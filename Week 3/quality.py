@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+
+"""quality.py: Quality trimming and filtering of fastq reads.
+
+Reads are taken from iterFastq in batches, and each batch's Phred+33
+quality strings are decoded into one NumPy array.  Trimming, filtering
+and a per-position histogram of the input qualities are then computed
+for the whole batch at once, and the reads that pass are streamed out,
+so only one batch is in memory at a time.
+"""
+
+import numpy as np
+
+from assembly import iterFastq
+
+PHRED_OFFSET = 33
+MAX_QUAL = 93  # '~', the highest Phred+33 character
+
+
+def _as_matrix(strings, offset=0):
+    """Return (array of padded uint8 codes - offset, array of lengths).
+
+    Rows are padded with zeros past each string's length.
+    """
+    lengths = np.array([len(s) for s in strings], dtype=np.int64)
+    width = int(lengths.max(initial=0))
+    if (lengths == width).all():  # usual case: one read length
+        codes = np.frombuffer(''.join(strings).encode('ascii'),
+                              dtype=np.uint8).reshape(len(strings), width)
+        return codes - np.uint8(offset), lengths
+    codes = np.zeros((len(strings), width), dtype=np.uint8)
+    for i, s in enumerate(strings):
+        codes[i, :len(s)] = np.frombuffer(s.encode('ascii'),
+                                          dtype=np.uint8) - np.uint8(offset)
+    return codes, lengths
+
+
+def decode_qualities(quals):
+    """Return (scores, lengths) for a batch of Phred+33 quality strings.
+
+    scores has one row of Phred scores per read, 0 past its length.
+    """
+    return _as_matrix(quals, PHRED_OFFSET)
+
+
+def window_trim(scores, lengths, window=4, threshold=20):
+    """Return (start, end) arrays of the part of each read to keep.
+
+    A window of window bases passes if its mean quality is at least
+    threshold.  The 5' end is cut up to the first passing window and
+    the 3' end after the last window passing before the first failing
+    one.  Reads shorter than window are one window.  Reads with no
+    passing window get start == end == 0.
+    """
+    batch, width = scores.shape
+    if width == 0:
+        empty = np.zeros(batch, dtype=np.int64)
+        return empty, empty
+    sums = np.zeros((batch, width + 1), dtype=np.int64)
+    np.cumsum(scores, axis=1, out=sums[:, 1:])
+    span = np.minimum(window, lengths)
+    pos = np.arange(width)
+    valid = (pos <= (lengths - span)[:, None]) & (span > 0)[:, None]
+    ends = np.minimum(pos + span[:, None], width)
+    window_sums = np.take_along_axis(sums, ends, axis=1) - sums[:, :width]
+    good = valid & (window_sums >= threshold * span[:, None])
+    has_good = good.any(axis=1)
+    start = np.where(has_good, good.argmax(axis=1), 0)
+    bad = valid & ~good & (pos >= start[:, None])
+    has_bad = bad.any(axis=1)
+    end = np.where(has_bad, bad.argmax(axis=1) - 1 + span, lengths)
+    end = np.where(has_good, end, 0)
+    return start, end
+
+
+class QualityStats(object):
+    """ Read and base counts in and out of the filter, and a histogram
+        of the input quality scores at each read position """
+
+    def __init__(self):
+        self.reads_in = 0
+        self.reads_out = 0
+        self.bases_in = 0
+        self.bases_out = 0
+        # histogram[i, q]: number of bases at position i with score q
+        self.histogram = np.zeros((0, MAX_QUAL + 1), dtype=np.int64)
+
+    def add(self, scores, lengths):
+        """ Count a batch of decoded input qualities """
+        batch, width = scores.shape
+        if width > len(self.histogram):
+            grown = np.zeros((width, MAX_QUAL + 1), dtype=np.int64)
+            grown[:len(self.histogram)] = self.histogram
+            self.histogram = grown
+        inside = np.arange(width) < lengths[:, None]
+        cells = np.arange(width) * (MAX_QUAL + 1) + \
+            np.minimum(scores, MAX_QUAL)
+        counts = np.bincount(cells[inside], minlength=width * (MAX_QUAL + 1))
+        self.histogram[:width] += counts.reshape(width, MAX_QUAL + 1)
+        self.reads_in += batch
+        self.bases_in += int(lengths.sum())
+
+    def mean_quality(self):
+        """ Return the mean input quality at each read position """
+        totals = self.histogram.sum(axis=1)
+        scored = self.histogram @ np.arange(MAX_QUAL + 1)
+        return scored / np.maximum(totals, 1)
+
+
+def filter_reads(batches, stats=None, window=4, threshold=20, min_length=30,
+                 min_mean=20, max_n=0.1):
+    """Yield trimmed (name, sequence, quality) records passing filters.
+
+    batches is an iterable of lists of records, as iterFastq(filename,
+    batch_size) yields.  Each read is window-trimmed, then kept if at
+    least min_length bases remain, their mean quality is at least
+    min_mean and at most a max_n fraction of them are N.  If stats (a
+    QualityStats) is given, it is updated with every batch.
+    """
+    for batch in batches:
+        names, seqs, quals = zip(*batch)
+        scores, lengths = decode_qualities(quals)
+        if stats is not None:
+            stats.add(scores, lengths)
+        start, end = window_trim(scores, lengths, window, threshold)
+        pos = np.arange(scores.shape[1])
+        kept = (pos >= start[:, None]) & (pos < end[:, None])
+        size = end - start
+        quality = (scores * kept).sum(axis=1)
+        bases, _ = _as_matrix(seqs)
+        ns = ((bases == ord('N')) & kept).sum(axis=1)
+        keep = (size >= np.maximum(min_length, 1)) & \
+            (quality >= min_mean * size) & (ns <= max_n * size)
+        for i in np.nonzero(keep)[0]:
+            s, e = start[i], end[i]
+            if stats is not None:
+                stats.reads_out += 1
+                stats.bases_out += int(e - s)
+            yield names[i], seqs[i][s:e], quals[i][s:e]
+
+
+def filter_fastq(infile, outfile, batch_size=10000, window=4, threshold=20,
+                 min_length=30, min_mean=20, max_n=0.1):
+    """Write reads of infile passing filter_reads to outfile.
+
+    Return the QualityStats of the run.
+    """
+    stats = QualityStats()
+    batches = iterFastq(infile, batch_size)
+    with open(outfile, 'w') as out:
+        for name, seq, qual in filter_reads(batches, stats, window,
+                                            threshold, min_length, min_mean,
+                                            max_n):
+            out.write('@%s\n%s\n+\n%s\n' % (name, seq, qual))
+    return stats
+
+
+if __name__ == '__main__':
+    import time
+    from assembly import readFastq, overlap_edges
+    from layout import reduce_edges
+
+    start = time.time()
+    stats = filter_fastq('ERR266411_1.for_asm.fastq', 'filtered.fastq')
+    print("%d of %d reads, %d of %d bases kept (%.2fs)"
+          % (stats.reads_out, stats.reads_in, stats.bases_out,
+             stats.bases_in, time.time() - start))
+    means = stats.mean_quality()
+    print("mean quality by position: %.1f at 1 .. %.1f at %d"
+          % (means[0], means[-1], len(means)))
+    for filename in ('ERR266411_1.for_asm.fastq', 'filtered.fastq'):
+        reads, _ = readFastq(filename)
+        start = time.time()
+        edges = overlap_edges(reads, 30)
+        reduced = reduce_edges(reads, edges)
+        print("%s: %d overlaps of length 30, %d after reduction (%.2fs)"
+              % (filename, len(edges), len(reduced), time.time() - start))
@@ -5,9 +5,13 @@
 Using DeBruijn and shortest common superstring.
 """
 
-import itertools
+import gzip
+import io
+import heapq
 from collections import defaultdict
 
+import numpy as np
+
 
 def overlap(a, b, min_length=3):
     """Return length of longest suffix of 'a'.
@@ -27,44 +31,118 @@ def overlap(a, b, min_length=3):
         start += 1  # move just past previous match
 
 
+def overlap_matrix(ss, min_length=1):
+    """Return n x n array of overlap(ss[i], ss[j], min_length)."""
+    n = len(ss)
+    olens = np.zeros((n, n), dtype=np.int32)
+    for i in range(n):
+        for j in range(n):
+            if i != j:
+                olens[i, j] = overlap(ss[i], ss[j], min_length=min_length)
+    return olens
+
+
+def _scs_table(ss):
+    """Return (cost, g) for the Held-Karp superstring DP over ss.
+
+    cost[i, j] is what appending ss[j] after ss[i] adds to a superstring,
+    len(ss[j]) - overlap(ss[i], ss[j], min_length=1), the same overlap the
+    permutation search uses.  g[mask, i] is the least length still to be
+    added after a superstring that has placed the strings in mask and
+    ends with ss[i].  Masks are filled from the full set down, one
+    popcount layer at a time, each layer in a few vectorized steps.
+    """
+    n = len(ss)
+    lengths = np.array([len(s) for s in ss], dtype=np.int32)
+    cost = lengths[None, :] - overlap_matrix(ss)
+    inf = np.iinfo(np.int32).max // 2
+    masks = np.arange(1 << n, dtype=np.int64)
+    popcount = np.zeros(1 << n, dtype=np.int8)
+    for j in range(n):
+        popcount += (masks >> j) & 1
+    g = np.full((1 << n, n), inf, dtype=np.int32)
+    g[(1 << n) - 1] = 0
+    for layer in range(n - 1, 0, -1):
+        layer_masks = masks[popcount == layer]
+        best = np.full((len(layer_masks), n), inf, dtype=np.int32)
+        for j in range(n):
+            rows = np.nonzero((layer_masks >> j) & 1 == 0)[0]
+            free = layer_masks[rows]
+            # extend every string i by ss[j]
+            cand = cost[:, j][None, :] + g[free | (1 << j), j][:, None]
+            best[rows] = np.minimum(best[rows], cand)
+        g[layer_masks] = best
+    return cost, g
+
+
+def _scs_orders(ss, first_only):
+    """Yield the orders of ss giving a shortest superstring, in
+    itertools.permutations order (ties included)."""
+    n = len(ss)
+    if n == 0:
+        yield ()
+        return
+    cost, g = _scs_table(ss)
+    full = (1 << n) - 1
+    starts = [len(ss[i]) + int(g[1 << i, i]) for i in range(n)]
+    best = min(starts)
+
+    def extend(order, mask):
+        if mask == full:
+            yield tuple(order)
+            return
+        i = order[-1]
+        need = g[mask, i]
+        for j in range(n):
+            if not mask & (1 << j) and \
+                    cost[i, j] + g[mask | (1 << j), j] == need:
+                order.append(j)
+                for found in extend(order, mask | (1 << j)):
+                    yield found
+                    if first_only:
+                        return
+                order.pop()
+
+    for i in range(n):
+        if starts[i] == best:
+            for found in extend([i], 1 << i):
+                yield found
+                if first_only:
+                    return
+
+
+def _superstring(ss, order):
+    """Return the superstring of ss joined in order, as scs builds it."""
+    if not order:
+        return ''
+    sup = ss[order[0]]
+    for a, b in zip(order, order[1:]):
+        sup += ss[b][overlap(ss[a], ss[b], min_length=1):]
+    return sup
+
+
 def scs(ss):
-    """Return shortest common superstring."""
-    shortest_sup = None
-    for ssperm in itertools.permutations(ss):
-        sup = ssperm[0]  # superstring starts as first string
-        for i in range(len(ss)-1):
-            # overlap adjacent strings A and B in the permutation
-            olen = overlap(ssperm[i], ssperm[i+1], min_length=1)
-            # add non-overlapping portion of B to superstring
-            sup += ssperm[i+1][olen:]
-        if shortest_sup is None or len(sup) < len(shortest_sup):
-            shortest_sup = sup  # found shorter superstring
-    return shortest_sup  # return shortest
+    """Return shortest common superstring.
+
+    This is the superstring of the first permutation of ss, in
+    itertools.permutations order, whose superstring is shortest.  The
+    overlaps are computed once and the best order is found with a
+    Held-Karp dynamic program over (strings placed, last string), so
+    O(2^n n^2) work instead of n! permutations; about 20 strings take
+    seconds.
+    """
+    for order in _scs_orders(ss, first_only=True):
+        return _superstring(ss, order)
 
 
 def all_scs(ss):
-    """Return all shortest common superstrings."""
-    shortest_sup = None
-    all_short_sups = []
-    for ssperm in itertools.permutations(ss):
-        sup = ssperm[0]  # superstring starts as first string
-        for i in range(len(ss)-1):
-            # overlap adjacent strings A and B in the permutation
-            olen = overlap(ssperm[i], ssperm[i+1], min_length=1)
-            # add non-overlapping portion of B to superstring
-            sup += ssperm[i+1][olen:]
-        if shortest_sup is None or len(sup) <= len(shortest_sup):
-            shortest_sup = sup  # found shorter superstring
-            all_short_sups.append(sup)
-    length = len(all_short_sups[0])
-    for sup in all_short_sups:
-        if len(sup) < length:
-            length = len(sup)
-    results = []
-    for sup in all_short_sups:
-        if len(sup) == length:
-            results.append(sup)
-    return results  # return shortest
+    """Return all shortest common superstrings.
+
+    One per optimal permutation of ss, in itertools.permutations order,
+    so equal superstrings from different permutations are repeated.
+    """
+    return [_superstring(ss, order)
+            for order in _scs_orders(ss, first_only=False)]
 
 
 def pick_maximal_overlap(reads, k):
@@ -102,6 +180,292 @@ def greedy_scs(reads, k):
     return ''.join(reads)
 
 
+def _greedy_sweep(reads, ks, edges=None):
+    """Return dict mapping each k in ks to greedy_contigs(reads, k).
+
+    Greedy merging always takes the longest remaining overlap, so the run
+    for a smaller k is the run for a larger k followed by merges of
+    shorter overlaps.  The ks are therefore handled from largest to
+    smallest, each stage continuing from the reads left by the previous
+    one and only looking for overlaps among those.
+    """
+    seqs = list(reads)  # read id -> string; merged reads are appended
+    alive = [True] * len(seqs)
+    parent = list(range(len(seqs)))  # merged-away read -> read it is in
+
+    def find(i):
+        root = i
+        while parent[root] != root:
+            root = parent[root]
+        while parent[i] != root:
+            parent[i], i = root, parent[i]
+        return root
+
+    contigs = {}
+    for k in sorted(set(ks), reverse=True):
+        # k-mer -> ids of reads containing it.  A merged read has exactly
+        # the k-mers of its two parts (every window lies in one of them
+        # since the overlap is >= k), so ids are never updated, only
+        # resolved by find
+        index = defaultdict(set)
+        for rid, read in enumerate(seqs):
+            if alive[rid] and len(read) >= k:
+                for i in range(len(read) - k + 1):
+                    index[read[i:i+k]].add(rid)
+
+        heap = []
+
+        def push(a, b):
+            if a != b and seqs[a] != seqs[b]:
+                olen = overlap(seqs[a], seqs[b], min_length=k)
+                if olen > 0:
+                    heapq.heappush(heap, (-olen, a, b))
+
+        def push_out(a):
+            # b can only overlap a by >= k if it contains a's k-suffix
+            if len(seqs[a]) >= k:
+                for b in {find(b) for b in index.get(seqs[a][-k:], ())}:
+                    push(a, b)
+
+        def push_in(b):
+            # and a can only overlap b if it contains b's k-prefix
+            if len(seqs[b]) >= k:
+                for a in {find(a) for a in index.get(seqs[b][:k], ())}:
+                    push(a, b)
+
+        if edges is None:
+            for rid in range(len(seqs)):
+                if alive[rid]:
+                    push_out(rid)
+        else:  # only the first stage starts from the given edges
+            heap = [(-olen, a, b) for a, b, olen in edges if olen >= k]
+            heapq.heapify(heap)
+            edges = None
+
+        while heap:
+            neg_olen, a, b = heapq.heappop(heap)
+            if not (alive[a] and alive[b]):
+                continue  # stale edge
+            olen = -neg_olen
+            merged = seqs[a] + seqs[b][olen:]
+            mid = len(seqs)
+            seqs.append(merged)
+            alive.append(True)
+            parent.append(mid)
+            for rid in (a, b):
+                alive[rid] = False
+                parent[rid] = mid
+            push_out(mid)
+            push_in(mid)
+        contigs[k] = [seqs[rid] for rid in range(len(seqs)) if alive[rid]]
+    return contigs
+
+
+def greedy_contigs(reads, k, edges=None):
+    """Return the reads left by greedy merging, in greedy_scs list order.
+
+    Candidate overlaps are computed once and kept in a max-heap keyed on
+    (overlap length, list position of the left read, list position of
+    the right read), so ties break as in pick_maximal_overlap.  After a
+    merge, only edges into and out of the merged read are added; edges
+    touching merged-away reads are skipped lazily when popped.  edges,
+    if given, are the initial (a, b, olen) overlaps between read
+    positions, with olen >= k.  reads itself is not modified.
+    """
+    return _greedy_sweep(reads, [k], edges)[k]
+
+
+def greedy_scs_sweep(reads, ks):
+    """Return dict mapping each minimum overlap in ks to its contigs.
+
+    The contigs for each k are those greedy_contigs(reads, k) returns,
+    and ''.join of them is the greedy_scs superstring.  They come from a
+    single greedy run that lowers the minimum overlap step by step, so
+    a sweep over many k costs about one assembly.
+    """
+    return _greedy_sweep(reads, ks)
+
+
+def greedy_scs_heap(reads, k):
+    """Return the same superstring as greedy_scs, incrementally.
+
+    Unlike greedy_scs, the reads list is left unchanged.
+    """
+    return ''.join(greedy_contigs(reads, k))
+
+
+_BASES = 'ACGT'
+_CODES = {c: i for i, c in enumerate(_BASES)}
+
+
+def kmer_codes(read, k):
+    """Yield the 2-bit packed code of each k-mer of read.
+
+    k-mers containing a character other than A, C, G or T are skipped.
+    """
+    mask = (1 << (2 * k)) - 1
+    code = valid = 0  # valid: number of trailing ACGT characters
+    for c in read:
+        base = _CODES.get(c)
+        if base is None:
+            valid = 0
+            continue
+        code = ((code << 2) | base) & mask
+        valid += 1
+        if valid >= k:
+            yield code
+
+
+def decode_kmer(code, k):
+    """Return the string of a 2-bit packed k-mer."""
+    return ''.join(_BASES[(code >> (2 * i)) & 3] for i in range(k-1, -1, -1))
+
+
+def de_bruijn_kmers(reads, k, min_count=1):
+    """Return dict mapping packed k-mer codes to their counts in reads.
+
+    reads may be any iterable of sequences, so a generator over
+    iterFastq keeps memory down to one entry per distinct k-mer.  k-mers
+    seen fewer than min_count times (likely sequencing errors) are
+    dropped.  Each k-mer is an edge of the De Bruijn graph, from the
+    node of its (k-1)-prefix, code >> 2, to the node of its
+    (k-1)-suffix, code & (4^(k-1) - 1).
+    """
+    counts = defaultdict(int)
+    for read in reads:
+        for code in kmer_codes(read, k):
+            counts[code] += 1
+    if min_count > 1:
+        counts = {code: n for code, n in counts.items() if n >= min_count}
+    return dict(counts)
+
+
+def unitigs(kmers, k):
+    """Return the maximal non-branching paths of a De Bruijn graph.
+
+    kmers is the edge set from de_bruijn_kmers.  Each unitig is a tuple
+    (first node, last node, sequence), nodes being packed (k-1)-mers;
+    isolated cycles become unitigs that start and end at the same node.
+    Nodes are never stored: their edges are found by probing the four
+    possible k-mers on either side.
+    """
+    shift = 2 * (k - 1)
+    node_mask = (1 << shift) - 1
+
+    def out_edges(v):
+        return [(v << 2) | b for b in range(4) if (v << 2) | b in kmers]
+
+    def in_degree(v):
+        return sum((b << shift) | v in kmers for b in range(4))
+
+    def non_branching(v):
+        return in_degree(v) == 1 and len(out_edges(v)) == 1
+
+    used = set()
+    paths = []
+
+    def walk(code):
+        first = code >> 2
+        used.add(code)
+        seq = [decode_kmer(code, k)]
+        v = code & node_mask
+        while non_branching(v):
+            code = out_edges(v)[0]
+            if code in used:  # back round a cycle
+                break
+            used.add(code)
+            seq.append(_BASES[code & 3])
+            v = code & node_mask
+        paths.append((first, v, ''.join(seq)))
+
+    for code in kmers:
+        if code not in used and not non_branching(code >> 2):
+            walk(code)
+    # whatever is left lies on cycles of non-branching nodes
+    for code in kmers:
+        if code not in used:
+            walk(code)
+    return paths
+
+
+def unitig_copies(paths, kmers, k):
+    """Return the estimated number of genome copies of each unitig.
+
+    A repeat collapses into one unitig whose k-mers are seen once per
+    copy, so its copy number is its mean k-mer count over the coverage,
+    taken as the median count of all k-mers (most of a genome is not
+    repeated).  Every unitig has at least one copy.
+    """
+    counts = sorted(kmers.values())
+    coverage = counts[len(counts) // 2] if counts else 1
+    copies = []
+    for _, _, seq in paths:
+        seen = [kmers[code] for code in kmer_codes(seq, k)]
+        copies.append(max(1, int(round(sum(seen) / len(seen) / coverage))))
+    return copies
+
+
+def euler_walks(paths, k, copies=None):
+    """Return contigs spelled by Eulerian walks over unitigs.
+
+    The unitigs are the edges of a compacted graph between branching
+    nodes, unitig i being copies[i] parallel edges (one each if copies
+    is not given), so a repeat is walked once per copy.  Hierholzer's
+    algorithm is run from every node with more out- than in-edges, then
+    from any node with edges left, so each edge is used exactly once.
+    Where a component has no Eulerian path the walk found is split at
+    the breaks, giving one contig per trail.
+    """
+    if copies is None:
+        copies = [1] * len(paths)
+    out = defaultdict(list)
+    in_degree = defaultdict(int)
+    for i, (first, last, _) in enumerate(paths):
+        out[first].extend([i] * copies[i])
+        in_degree[last] += copies[i]
+    for edges in out.values():
+        edges.reverse()  # pop unitigs in the order they were found
+    starts = [v for v in out if len(out[v]) > in_degree[v]] + list(out)
+    contigs = []
+    for start in starts:
+        if not out[start]:
+            continue
+        stack = [(start, None)]
+        circuit = []
+        while stack:
+            v, i = stack[-1]
+            if out[v]:
+                j = out[v].pop()
+                stack.append((paths[j][1], j))
+            else:
+                stack.pop()
+                if i is not None:
+                    circuit.append(i)
+        circuit.reverse()
+        seq = paths[circuit[0]][2]
+        for prev, i in zip(circuit, circuit[1:]):
+            if paths[prev][1] == paths[i][0]:
+                seq += paths[i][2][k-1:]  # unitigs share a (k-1)-mer
+            else:
+                contigs.append(seq)
+                seq = paths[i][2]
+        contigs.append(seq)
+    return contigs
+
+
+def de_bruijn_contigs(reads, k, min_count=1):
+    """Return contigs assembled from reads with a De Bruijn graph.
+
+    Repeats are walked as many times as their k-mer counts say they
+    occur (see unitig_copies).  Memory grows with the number of distinct
+    k-mers, not with the reads, and the running time is linear in the
+    total read length.
+    """
+    kmers = de_bruijn_kmers(reads, k, min_count)
+    paths = unitigs(kmers, k)
+    return euler_walks(paths, k, unitig_copies(paths, kmers, k))
+
+
 def readGenome(filename):
     """Return a sequence from a fasta file."""
     genome = ''
@@ -113,18 +477,48 @@ def readGenome(filename):
     return genome
 
 
-def readFastq(filename):
-    """Return a tuple of sequences and qualities from a fastq file."""
-    sequences = []
-    qualities = []
-    with open(filename) as fh:
+def openFastq(filename, buffer_size=1 << 20):
+    """Return a buffered binary handle, decompressing gzip input."""
+    with open(filename, 'rb') as fh:
+        gzipped = fh.read(2) == b'\x1f\x8b'  # gzip magic number
+    if gzipped:
+        return io.BufferedReader(gzip.open(filename, 'rb'), buffer_size)
+    return open(filename, 'rb', buffering=buffer_size)
+
+
+def iterFastq(filename, batch_size=None, buffer_size=1 << 20):
+    """Yield (name, sequence, quality) records from a fastq file.
+
+    Records are read lazily, so memory stays flat however large the
+    file is.  If batch_size is given, lists of up to batch_size records
+    are yielded instead of single records.
+    """
+    batch = []
+    with openFastq(filename, buffer_size) as fh:
         while True:
-            fh.readline()  # skip name line
+            name = fh.readline().rstrip()  # name line, starts with '@'
             seq = fh.readline().rstrip()  # read base sequence
             fh.readline()  # skip placeholder line
             qual = fh.readline().rstrip()  # base quality line
             if len(seq) == 0:
                 break
-            sequences.append(seq)
-            qualities.append(qual)
+            record = (name[1:].decode(), seq.decode(), qual.decode())
+            if batch_size is None:
+                yield record
+                continue
+            batch.append(record)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def readFastq(filename):
+    """Return a tuple of sequences and qualities from a fastq file."""
+    sequences = []
+    qualities = []
+    for _, seq, qual in iterFastq(filename):
+        sequences.append(seq)
+        qualities.append(qual)
     return sequences, qualities
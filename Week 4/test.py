@@ -1,6 +1,7 @@
 """Run code to answer quiz questions for week 4."""
 
-from assembly import scs, all_scs, readFastq, greedy_scs
+from assembly import scs, all_scs, readFastq, greedy_scs_sweep
+from assembly import de_bruijn_contigs
 strings = ['CCT', 'CTT', 'TGC', 'TGG', 'GAT', 'ATT']
 print("SCS result: ", scs(strings))
 print("SCS length: ", len(scs(strings)))
@@ -8,10 +9,20 @@ all_scses = all_scs(strings)
 print("SCS all result: ", all_scses)
 reads, qualities = readFastq('ads1_week4_reads.fq')
 genome_length = 15894
-for k in range(100, 1, -1):
-    full_genome = greedy_scs(reads, k)
+assemblies = greedy_scs_sweep(reads, range(100, 1, -1))
+full_genome = ''.join(assemblies[2])
 print("Fully assembled genome", full_genome)
 print("Fully assembled genome length: ", len(full_genome))
 print("Actual assembled genome length: ", genome_length)
 print("Number of As: ", full_genome.count("A"))
 print("Number of Ts: ", full_genome.count("T"))
+contigs = de_bruijn_contigs(reads, 31)
+print("De Bruijn contigs: ", len(contigs), ", matches greedy: ",
+      contigs == [full_genome])
+# a 60 bp repeat placed twice must be walked twice, not jumped across
+repeat = full_genome[1000:1060]
+repeat_genome = (full_genome[:250] + repeat + full_genome[250:440] + repeat +
+                 full_genome[440:500])
+contigs = de_bruijn_contigs([repeat_genome], 31)
+print("De Bruijn with a repeat: ", len(contigs), " contigs, correct: ",
+      contigs == [repeat_genome])